@@ -1,38 +1,262 @@
 # ai_assistant.py - AI response generation with multi-language support
 
+import asyncio
+import hashlib
+import httpx
+import json
 import logging
-from typing import Dict, Optional
-from openai import OpenAI
+import threading
+import time
+from collections import OrderedDict
+from string import Template
+from typing import Dict, Iterator, List, Optional, Tuple
+from openai import AsyncOpenAI, OpenAI
 import os
 from dotenv import load_dotenv
 import streamlit as st
+
+# Token counting is exact when tiktoken is installed, estimated otherwise
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# orjson speeds up payload encoding on the raw HTTP fast path when installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from config import Config
+from document_processor import DocumentIndex
 from localization import language_manager, t
+from response_cache import ResponseCache
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Document prompts and retrieval indexes kept across modules and sessions
+_DOC_CACHE_SIZE = 32
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize an object to compact JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: bytes):
+    """Parse JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Static prompt scaffolds. These are sent first and kept byte-identical across
+# requests so the provider's automatic prompt caching can reuse the prefix.
+COURSEWORK_SCAFFOLD = Template("""You are an expert academic assistant for University of Roehampton students.
+
+INSTRUCTIONS:
+- Answer questions based ONLY on the provided document content
+- If multiple documents are provided, clearly indicate which document contains specific information using the format **[Source: Document Name]**
+- When referencing content, use the document file names provided for clarity
+- Be helpful and educational, explaining concepts clearly
+- If information isn't in the document(s), say so clearly
+- Provide specific references to sections when possible
+- Help with coursework understanding, but don't do the work for the student
+- Encourage critical thinking and learning
+- Be supportive and encouraging
+
+$language_instructions
+
+Remember: You are helping a Roehampton University student understand their coursework materials. Always cite your sources when multiple documents are available.""")
+
+ETHICS_SCAFFOLD = Template("""You are an expert ethics advisor for University of Roehampton students. You are helping with ethics guidance based on the "Reforming Modernity" document.
+
+INSTRUCTIONS:
+- Answer ethics questions based ONLY on the provided "Reforming Modernity" document content
+- Provide thoughtful, well-reasoned ethical guidance based on what's actually in the document
+- Reference specific sections, concepts, or examples from the document when relevant
+- If the document discusses specific ethical frameworks, theories, or principles, use those
+- Help students understand and apply the ethical concepts presented in this document
+- Encourage critical thinking about ethical issues as presented in the material
+- Be supportive and educational in your approach
+- If a question cannot be answered from the document content, clearly state this and suggest what topics the document does cover
+- Always maintain academic integrity and professional ethics standards
+
+CONTEXT:
+- Document: Reforming Modernity (University Ethics Material)
+- Purpose: Ethics guidance based on this specific document
+- Audience: Roehampton University student
+
+$language_instructions
+
+Remember: Base your responses strictly on the actual content of the "Reforming Modernity" document. If the document focuses on specific ethical themes, theories, or applications, emphasize those in your responses.""")
+
+# Per-document and per-request prompt pieces
+COURSEWORK_DOCUMENT_TEMPLATE = Template("""You are helping with the module: "$module_name" from the $programme programme.
+
+$document_info
+
+DOCUMENT CONTENT:
+$document_content
+
+CONTEXT:
+- Module: $module_name
+- Programme: $programme
+- Materials: $coursework_type""")
+
+ETHICS_DOCUMENT_TEMPLATE = Template("""ETHICS DOCUMENT CONTENT:
+$document_content""")
+
+STUDENT_CONTEXT_TEMPLATE = Template("""STUDENT INFORMATION:
+- Student ID: $student_id
+- Programme: $programme
+
+""")
+
 class AIAssistant:
     """Handles AI response generation and OpenAI interactions with multi-language support"""
     
+    # Language-specific instructions with the language name already baked in
+    _LANG_INSTRUCTIONS = {
+        'en': "LANGUAGE: Respond in English.",
+        'ar': """LANGUAGE REQUIREMENTS:
+- RESPOND ENTIRELY IN ARABIC (Arabic)
+- Use proper Arabic grammar and formal academic language
+- Write from right to left as appropriate for Arabic
+- Use Arabic academic terminology when available
+- Maintain respectful and formal tone appropriate for Arabic academic context
+- If you need to reference English terms or names, you may include them in parentheses after the Arabic translation""",
+        'fr': """LANGUAGE REQUIREMENTS:
+- RESPOND ENTIRELY IN FRENCH (French)
+- Use proper French grammar and academic language
+- Use formal "vous" form when addressing the student
+- Use French academic terminology when available
+- Maintain professional and supportive tone appropriate for French academic context
+- Use proper French accents and punctuation""",
+        'es': """LANGUAGE REQUIREMENTS:
+- RESPOND ENTIRELY IN SPANISH (Spanish)
+- Use proper Spanish grammar and academic language
+- Use formal "usted" form when addressing the student
+- Use Spanish academic terminology when available
+- Maintain professional and supportive tone appropriate for Spanish academic context
+- Use proper Spanish accents and punctuation"""
+    }
+    
     def __init__(self):
         self.client = None
+        self.async_client = None
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.model = "gpt-3.5-turbo"
-        self.max_tokens = 1500
-        self.temperature = 0.3
-        self.max_content_length = 15000
+        self._chat_completions_url = None
+        self._auth_headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self.model = Config.MODEL
+        self.model_for_short_queries = Config.SHORT_QUERY_MODEL
+        self.max_tokens = Config.MAX_TOKENS
+        self.short_query_max_tokens = Config.SHORT_QUERY_MAX_TOKENS
+        self.temperature = Config.TEMPERATURE
+        self.max_content_tokens = Config.MAX_CONTENT_TOKENS
+        self._encoding = self._load_encoding(self.model)
         
         if self.api_key:
             try:
-                self.client = OpenAI(api_key=self.api_key)
+                # Pooled HTTP clients keep TLS connections warm between requests;
+                # the SDK retries 429/5xx/connection errors with exponential backoff
+                self.client = OpenAI(
+                    api_key=self.api_key,
+                    max_retries=Config.OPENAI_MAX_RETRIES,
+                    http_client=httpx.Client(**self._http_client_options())
+                )
+                self.async_client = self._create_async_client()
+                self._chat_completions_url = f"{str(self.client.base_url).rstrip('/')}/chat/completions"
                 logger.info("OpenAI client initialized successfully")
             except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
+                logger.error("Failed to initialize OpenAI client: %s", e)
                 self.client = None
+                self.async_client = None
         else:
             logger.warning("OpenAI API key not found")
+        
+        self.response_cache = ResponseCache(
+            max_entries=Config.RESPONSE_CACHE_SIZE,
+            similarity_threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+            embed_fn=self._embed_question if Config.SEMANTIC_CACHE_ENABLED else None,
+            path=Config.RESPONSE_CACHE_FILE or None
+        )
+        
+        # Precompute the static scaffolds for every supported language
+        self._coursework_scaffolds = {}
+        self._ethics_scaffolds = {}
+        for language_code in language_manager.get_language_options():
+            language_instructions = self._get_language_specific_instructions(
+                language_code, self.get_language_name(language_code)
+            )
+            self._coursework_scaffolds[language_code] = COURSEWORK_SCAFFOLD.substitute(
+                language_instructions=language_instructions
+            )
+            self._ethics_scaffolds[language_code] = ETHICS_SCAFFOLD.substitute(
+                language_instructions=language_instructions
+            )
+        
+        # Document system prompt per module and content: (module id, content digest) -> (document prompt, index).
+        # Keyed by digest so equal content rebuilt per load still hits. Documents over the
+        # token budget get a retrieval index instead of a fixed prompt.
+        self._doc_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._doc_cache_lock = threading.Lock()
+        
+        # Formatted document info per selected module
+        self._doc_info_cache: Dict[tuple, str] = {}
+    
+        # Translated guard-clause messages: language code -> {key: message}
+        self._err_msgs: Dict[str, Dict[str, str]] = {}
+        
+        # JSON-encoded scaffold messages for the raw HTTP fast path: scaffold -> bytes
+        self._encoded_scaffolds: Dict[str, bytes] = {}
+    
+    @staticmethod
+    def _http_client_options() -> Dict:
+        """Connection pool and timeout settings shared by the sync and async clients"""
+        return {
+            'timeout': httpx.Timeout(Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT),
+            'limits': httpx.Limits(
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+            ),
+        }
+    
+    @staticmethod
+    def _load_encoding(model: str):
+        """Load the tiktoken encoding for a model, if tiktoken is available"""
+        if not TIKTOKEN_AVAILABLE:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning("Failed to load tokenizer, estimating token counts: %s", e)
+            return None
+    
+    def _count_tokens(self, text: str) -> int:
+        """Count tokens in text, estimating ~4 characters per token without tiktoken"""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return len(text) // 4
+    
+    def _create_async_client(self) -> AsyncOpenAI:
+        """Create an AsyncOpenAI client with the shared connection settings"""
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            max_retries=Config.OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(**self._http_client_options())
+        )
     
     def is_available(self) -> bool:
         """Check if AI assistant is available"""
@@ -40,248 +264,553 @@ class AIAssistant:
     
     def get_language_name(self, lang_code: str) -> str:
         """Get full language name for the AI prompt"""
-        language_names = {
-            'en': 'English',
-            'ar': 'Arabic',
-            'fr': 'French',
-            'es': 'Spanish'
-        }
-        return language_names.get(lang_code, 'English')
+        return language_manager.get_language_name(lang_code)
     
-    def generate_coursework_response(self, question: str, document_content: str, module_info: Dict) -> str:
-        """Enhanced AI response generation for coursework with multi-language support"""
+    def _error_message(self, key: str, language: str) -> str:
+        """Get a translated guard-clause message, looked up once per language"""
+        messages = self._err_msgs.setdefault(language, {})
+        message = messages.get(key)
+        if message is None:
+            message = messages[key] = language_manager.get_text_for_language(language, key)
+        return message
+    
+    def _embed_question(self, question: str) -> Optional[list]:
+        """Compute an embedding for a question to support fuzzy cache matching"""
         if not self.client:
-            return t('api_key_missing')
-        
-        if not document_content:
-            return t('no_docs_error')
-        
-        if not question or not question.strip():
-            return t('enter_question')
-        
+            return None
+        response = self.client.embeddings.create(model=Config.EMBEDDING_MODEL, input=question)
+        return response.data[0].embedding
+    
+    def generate_coursework_response(self, question: str, document_content: str, module_info: Dict,
+                                     language: str = 'en') -> str:
+        """Enhanced AI response generation for coursework with multi-language support"""
+        return "".join(self.generate_coursework_response_stream(
+            question, document_content, module_info, language
+        )).strip()
+    
+    def generate_ethics_response(self, question: str, document_content: str, student_info: Dict,
+                                 language: str = 'en') -> str:
+        """Generate AI response for ethics-related questions with multi-language support"""
+        return "".join(self.generate_ethics_response_stream(
+            question, document_content, student_info, language
+        )).strip()
+    
+    def generate_coursework_response_stream(self, question: str, document_content: str,
+                                            module_info: Dict, language: str = 'en') -> Iterator[str]:
+        """Stream a coursework response chunk by chunk as it is generated"""
         try:
-            # Get current language
-            current_language = getattr(st.session_state, 'language', 'en')
-            language_name = self.get_language_name(current_language)
-            
-            # Create enhanced context-aware prompt with language specification
-            document_info = self._format_document_info(module_info)
-            system_prompt = self._create_coursework_system_prompt(
-                document_content, document_info, module_info, current_language, language_name
+            response_text, request = self._prepare_coursework_request(
+                question, document_content, module_info, language
             )
+            if request is None:
+                yield response_text
+                return
+        
+            yield from self._stream_request(request)
             
-            # Add language instruction to user question
-            if current_language != 'en':
-                language_instruction = f"Please respond in {language_name}. "
-                question = language_instruction + question
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
+        except Exception as e:
+            logger.error("Error generating AI response: %s", e)
+            yield t('response_error', error=str(e), default=f"Error generating response: {str(e)}")
+    
+    def generate_ethics_response_stream(self, question: str, document_content: str,
+                                        student_info: Dict, language: str = 'en') -> Iterator[str]:
+        """Stream an ethics response chunk by chunk as it is generated"""
+        try:
+            response_text, request = self._prepare_ethics_request(
+                question, document_content, student_info, language
             )
+            if request is None:
+                yield response_text
+                return
+        
+            yield from self._stream_request(request)
             
-            if response and response.choices and len(response.choices) > 0:
-                return response.choices[0].message.content.strip()
-            else:
-                return t('no_response_generated', default="No response generated from OpenAI")
+        except Exception as e:
+            logger.error("Error in generate_ethics_response: %s", e)
+            yield t('response_error', error=str(e), default=f"Error generating response: {str(e)}")
+    
+    async def agenerate_coursework_response(self, question: str, document_content: str, module_info: Dict,
+                                            language: str = 'en',
+                                            client: Optional[AsyncOpenAI] = None,
+                                            http_client: Optional[httpx.AsyncClient] = None) -> str:
+        """Async variant of generate_coursework_response for concurrent serving"""
+        try:
+            # Preparing may embed the question for a cache lookup, a blocking call
+            response_text, request = await asyncio.to_thread(
+                self._prepare_coursework_request, question, document_content, module_info, language
+            )
+            if request is None:
+                return response_text
             
+            return await self._acomplete(request, client or self.async_client, http_client)
+        
         except Exception as e:
-            logger.error(f"Error generating AI response: {e}")
+            logger.error("Error generating AI response: %s", e)
             return t('response_error', error=str(e), default=f"Error generating response: {str(e)}")
     
-    def generate_ethics_response(self, question: str, document_content: str, student_info: Dict) -> str:
-        """Generate AI response for ethics-related questions with multi-language support"""
-        if not self.client:
-            return t('api_key_missing')
+    async def agenerate_ethics_response(self, question: str, document_content: str, student_info: Dict,
+                                        language: str = 'en',
+                                        client: Optional[AsyncOpenAI] = None,
+                                        http_client: Optional[httpx.AsyncClient] = None) -> str:
+        """Async variant of generate_ethics_response for concurrent serving"""
+        try:
+            # Preparing may embed the question for a cache lookup, a blocking call
+            response_text, request = await asyncio.to_thread(
+                self._prepare_ethics_request, question, document_content, student_info, language
+            )
+            if request is None:
+                return response_text
+            
+            return await self._acomplete(request, client or self.async_client, http_client)
         
-        if not document_content or not document_content.strip():
-            return t('no_docs_error')
+        except Exception as e:
+            logger.error("Error in agenerate_ethics_response: %s", e)
+            return t('response_error', error=str(e), default=f"Error generating response: {str(e)}")
+    
+    def generate_batch(self, questions: List[str], document_content: str, module_info: Dict,
+                       language: str = 'en') -> List[str]:
+        """
+        Answer several coursework questions concurrently
         
-        if not question or not question.strip():
-            return t('enter_ethics_question')
+        Requests are dispatched in parallel, bounded by Config.MAX_CONCURRENT_REQUESTS,
+        as pre-encoded JSON over a pooled httpx client, falling back to the SDK
+        (with its retries) on HTTP errors. Must be called from synchronous code
+        (e.g. a Streamlit script), not from inside a running event loop.
         
-        try:
-            # Get current language
-            current_language = getattr(st.session_state, 'language', 'en')
-            language_name = self.get_language_name(current_language)
-            
-            # Safely get student info with defaults
-            student_id = student_info.get('student_id', 'Unknown') if student_info else 'Unknown'
-            programme = student_info.get('programme', 'Unknown') if student_info else 'Unknown'
+        Args:
+            questions: Questions to answer
+            document_content: Module document content
+            module_info: Selected module information
+            language: Language code for the responses
             
-            # Truncate content if too long
-            truncated_content = document_content[:self.max_content_length]
+        Returns:
+            Responses in the same order as the questions
+        """
+        if not self.async_client:
+            return [self._error_message('api_key_missing', language)] * len(questions)
+        
+        async def run_all() -> List[str]:
+            semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_REQUESTS)
             
-            system_prompt = self._create_ethics_system_prompt(
-                truncated_content, student_id, programme, current_language, language_name
-            )
+            # asyncio.run creates a fresh event loop, so use clients scoped to it
+            async with self._create_async_client() as client, \
+                    httpx.AsyncClient(**self._http_client_options()) as http_client:
+                async def answer(question: str) -> str:
+                    async with semaphore:
+                        return await self.agenerate_coursework_response(
+                            question, document_content, module_info, language,
+                            client=client, http_client=http_client
+                        )
             
-            # Add language instruction to user question
-            if current_language != 'en':
-                language_instruction = f"Please respond in {language_name}. "
-                question = language_instruction + question
+                return await asyncio.gather(*(answer(question) for question in questions))
+        
+        return asyncio.run(run_all())
+    
+    def generate_batch_offline(self, batch_requests: List[Dict]) -> List[str]:
+        """
+        Answer coursework questions through the OpenAI Batch API
+        
+        Intended for non-interactive bulk work such as pre-generating hints for
+        a whole class. Batch requests are billed at a discount and use a
+        separate rate-limit pool, but may take up to 24 hours to complete, so
+        this call blocks while polling.
+        
+        Args:
+            batch_requests: Dicts with 'question', 'document_content', 'module_info'
+                and optionally 'language' (defaults to English)
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
+        Returns:
+            Responses in the same order as the requests
+        """
+        results: List[Optional[str]] = [None] * len(batch_requests)
+        pending = {}
+        
+        for index, item in enumerate(batch_requests):
+            response_text, request = self._prepare_coursework_request(
+                item.get('question', ''), item.get('document_content', ''), item.get('module_info') or {},
+                item.get('language', 'en')
             )
-            
-            if response and response.choices and len(response.choices) > 0:
-                result = response.choices[0].message.content.strip()
-                logger.info("Successfully generated ethics response")
-                return result
+            if request is None:
+                results[index] = response_text
             else:
-                return t('no_response_generated', default="No response generated from OpenAI")
+                pending[str(index)] = request
+        
+        if pending:
+            try:
+                batch_id = self.submit_batch({custom_id: request['params'] for custom_id, request in pending.items()})
+                outputs = self.wait_for_batch(batch_id)
+                
+                for custom_id, request in pending.items():
+                    result = outputs.get(custom_id)
+                    if result:
+                        self.response_cache.store(request['cache_scope'], request['question'], result, request['embedding'])
+                        results[int(custom_id)] = result
+                    else:
+                        results[int(custom_id)] = t('no_response_generated', default="No response generated from OpenAI")
             
-        except Exception as e:
-            logger.error(f"Error in generate_ethics_response: {str(e)}")
-            return t('response_error', error=str(e), default=f"Error generating response: {str(e)}")
+            except Exception as e:
+                logger.error("Error running offline batch: %s", e)
+                error_msg = t('response_error', error=str(e), default=f"Error generating response: {str(e)}")
+                for custom_id in pending:
+                    results[int(custom_id)] = error_msg
+        
+        return results
+    
+    def submit_batch(self, requests_params: Dict[str, Dict]) -> str:
+        """Upload chat completion requests as JSONL and start a batch; returns the batch id"""
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": params
+            })
+            for custom_id, params in requests_params.items()
+        ]
+        batch_file = self.client.files.create(
+            file=("batch_requests.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("Submitted batch %s with %d requests", batch.id, len(lines))
+        return batch.id
+    
+    def wait_for_batch(self, batch_id: str, poll_interval: Optional[float] = None) -> Dict[str, str]:
+        """Poll a batch until it finishes and return response text by custom id"""
+        poll_interval = poll_interval or Config.BATCH_POLL_INTERVAL
+        
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"Batch {batch_id} ended with status: {batch.status}")
+            time.sleep(poll_interval)
+        
+        outputs = {}
+        if not batch.output_file_id:
+            return outputs
+        
+        for line in self.client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            body = (record.get('response') or {}).get('body') or {}
+            choices = body.get('choices') or []
+            if choices:
+                outputs[record['custom_id']] = choices[0]['message']['content'].strip()
+        
+        logger.info("Batch %s completed with %d responses", batch_id, len(outputs))
+        return outputs
+    
+    def _prepare_coursework_request(self, question: str, document_content: str, module_info: Dict,
+                                    language: str = 'en') -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Validate a coursework question and build its API request
+        
+        Returns:
+            Tuple of (immediate response, None) when no API call is needed,
+            otherwise (None, request)
+        """
+        if not self.client:
+            return self._error_message('api_key_missing', language), None
+        
+        if not document_content:
+            return self._error_message('no_docs_error', language), None
+        
+        if not question or not question.strip():
+            return self._error_message('enter_question', language), None
+        
+        language_name = self.get_language_name(language)
+        
+        # Serve repeated or paraphrased questions from the response cache
+        module_name = module_info.get('module') if module_info else None
+        cache_scope = ResponseCache.make_scope(module_name, language, document_content)
+        cached_response, question_embedding = self.response_cache.lookup(cache_scope, question)
+        if cached_response is not None:
+            logger.info("Serving coursework response from cache")
+            return cached_response, None
+        original_question = question
+        
+        # Add language instruction to user question
+        if language != 'en':
+            language_instruction = f"Please respond in {language_name}. "
+            question = language_instruction + question
+        
+        # Create enhanced context-aware prompt with language specification
+        document_info = self._format_document_info(module_info)
+        messages = self._create_coursework_messages(
+            question, document_content, document_info, module_info, language, language_name,
+            query=original_question
+        )
+        
+        return None, {
+            'params': self._completion_params(messages, original_question),
+            'cache_scope': cache_scope,
+            'question': original_question,
+            'embedding': question_embedding,
+            'language': language,
+            'kind': 'coursework'
+        }
+    
+    def _prepare_ethics_request(self, question: str, document_content: str, student_info: Dict,
+                                language: str = 'en') -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Validate an ethics question and build its API request
+        
+        Returns:
+            Tuple of (immediate response, None) when no API call is needed,
+            otherwise (None, request)
+        """
+        if not self.client:
+            return self._error_message('api_key_missing', language), None
+        
+        if not document_content or not document_content.strip():
+            return self._error_message('no_docs_error', language), None
+        
+        if not question or not question.strip():
+            return self._error_message('enter_ethics_question', language), None
+        
+        language_name = self.get_language_name(language)
+        
+        # Safely get student info with defaults
+        student_id = student_info.get('student_id', 'Unknown') if student_info else 'Unknown'
+        programme = student_info.get('programme', 'Unknown') if student_info else 'Unknown'
+        
+        # Serve repeated or paraphrased questions from the response cache
+        cache_scope = ResponseCache.make_scope('ethics', language, document_content)
+        cached_response, question_embedding = self.response_cache.lookup(cache_scope, question)
+        if cached_response is not None:
+            logger.info("Serving ethics response from cache")
+            return cached_response, None
+        original_question = question
+        
+        # Add language instruction to user question
+        if language != 'en':
+            language_instruction = f"Please respond in {language_name}. "
+            question = language_instruction + question
+        
+        messages = self._create_ethics_messages(
+            question, document_content, student_id, programme, language, language_name,
+            query=original_question
+        )
+        
+        return None, {
+            'params': self._completion_params(messages, original_question),
+            'cache_scope': cache_scope,
+            'question': original_question,
+            'embedding': question_embedding,
+            'language': language,
+            'kind': 'ethics'
+        }
+    
+    def _completion_params(self, messages: List[Dict], question: str) -> Dict:
+        """Build chat completion parameters, routing short questions to the cheaper model"""
+        is_short_query = self._count_tokens(question) < Config.SHORT_QUERY_TOKEN_LIMIT
+        return {
+            'model': self.model_for_short_queries if is_short_query else self.model,
+            'messages': messages,
+            'max_tokens': self.short_query_max_tokens if is_short_query else self.max_tokens,
+            'temperature': self.temperature,
+            'response_format': {"type": "text"},
+        }
+    
+    def _stream_request(self, request: Dict) -> Iterator[str]:
+        """Stream a prepared request and store the full response in the response cache"""
+        stream = self.client.chat.completions.create(**request['params'], stream=True)
+        
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                parts.append(content)
+                yield content
+        
+        result = "".join(parts).strip()
+        if result:
+            logger.info("Generated %s response length=%d lang=%s",
+                        request['kind'], len(result), request['language'])
+            self.response_cache.store(request['cache_scope'], request['question'], result, request['embedding'])
+        else:
+            yield t('no_response_generated', default="No response generated from OpenAI")
+    
+    async def _acomplete(self, request: Dict, client: AsyncOpenAI,
+                         http_client: Optional[httpx.AsyncClient] = None) -> str:
+        """Run a prepared request asynchronously, through the raw HTTP fast path when given a client"""
+        if http_client is not None and self._chat_completions_url:
+            try:
+                data = await self._post_chat_completion(self._encode_payload(request['params']), http_client)
+                choices = data.get('choices') or []
+                return self._finish_content(choices[0]['message']['content'] if choices else None, request)
+            except httpx.HTTPError as e:
+                logger.warning("Raw chat completion failed, retrying through the SDK: %s", e)
+        
+        response = await client.chat.completions.create(**request['params'])
+        return self._finish_request(response, request)
+    
+    async def _post_chat_completion(self, payload: bytes, http_client: httpx.AsyncClient) -> Dict:
+        """POST a pre-encoded chat completion payload, bypassing SDK request/response models"""
+        response = await http_client.post(self._chat_completions_url, content=payload, headers=self._auth_headers)
+        response.raise_for_status()
+        return _json_loads(response.content)
+    
+    def _encode_payload(self, params: Dict) -> bytes:
+        """Encode chat completion parameters as JSON, reusing the encoded static scaffold"""
+        messages = params['messages']
+        scaffold = messages[0]['content']
+        encoded_scaffold = self._encoded_scaffolds.get(scaffold)
+        if encoded_scaffold is None:
+            encoded_scaffold = self._encoded_scaffolds[scaffold] = _json_dumps(messages[0])
+        
+        parts = [b'{"messages":[', encoded_scaffold]
+        for message in messages[1:]:
+            parts.append(b',')
+            parts.append(_json_dumps(message))
+        parts.append(b'],')
+        # Remaining parameters, minus the opening brace of their own object
+        parts.append(_json_dumps({key: value for key, value in params.items() if key != 'messages'})[1:])
+        return b"".join(parts)
+    
+    def _finish_request(self, response, request: Dict) -> str:
+        """Extract the response text and store it in the response cache"""
+        content = response.choices[0].message.content if response and response.choices else None
+        return self._finish_content(content, request)
+    
+    def _finish_content(self, content: Optional[str], request: Dict) -> str:
+        """Store a completed response in the response cache and return it"""
+        if content:
+            result = content.strip()
+            logger.info("Generated %s response length=%d lang=%s",
+                        request['kind'], len(result), request['language'])
+            self.response_cache.store(request['cache_scope'], request['question'], result, request['embedding'])
+            return result
+        else:
+            return t('no_response_generated', default="No response generated from OpenAI")
     
     def _format_document_info(self, module_info: Dict) -> str:
         """Format document information for display"""
         if not module_info:
             return "No module information available"
             
+        cache_key = (
+            module_info.get('module'),
+            module_info.get('pdf_file'),
+            module_info.get('display_name'),
+            module_info.get('coursework_type'),
+            tuple(pdf_data.get('pdf_file') for pdf_data in module_info.get('all_pdfs', []))
+        )
+        document_info = self._doc_info_cache.get(cache_key)
+        if document_info is not None:
+            return document_info
+        
         if module_info.get('pdf_file') == 'multiple':
-            document_info = f"Multiple documents loaded for {module_info.get('module', 'Unknown Module')}:\n"
+            lines = [f"Multiple documents loaded for {module_info.get('module', 'Unknown Module')}:\n"]
             all_pdfs = module_info.get('all_pdfs', [])
             for pdf_data in all_pdfs:
                 display_name = pdf_data.get('display_name', 'Unknown Document')
                 coursework_type = pdf_data.get('coursework_type', 'Unknown Type')
                 pdf_file = pdf_data.get('pdf_file', 'Unknown File')
-                document_info += f"- {display_name} ({coursework_type}) - File: {pdf_file}\n"
+                lines.append(f"- {display_name} ({coursework_type}) - File: {pdf_file}\n")
+            document_info = "".join(lines)
         else:
             display_name = module_info.get('display_name', 'Unknown Document')
             coursework_type = module_info.get('coursework_type', 'Unknown Type')
             pdf_file = module_info.get('pdf_file', 'Unknown File')
             document_info = f"Document: {display_name} ({coursework_type}) - File: {pdf_file}"
         
+        self._doc_info_cache[cache_key] = document_info
         return document_info
     
-    def _create_coursework_system_prompt(self, document_content: str, document_info: str, 
-                                       module_info: Dict, language_code: str, language_name: str) -> str:
-        """Create system prompt for coursework assistance with language specification"""
-        module_name = module_info.get('module', 'Unknown Module')
-        programme = module_info.get('programme', 'Unknown Programme')
-        coursework_type = module_info.get('coursework_type', 'Course Materials')
+    def _get_document_prompt(self, module_id: str, document_content: str, query: str,
+                             template: Template, **fields) -> str:
+        """
+        Build the document system prompt for a module
         
-        # Truncate content if too long
-        truncated_content = document_content[:self.max_content_length]
+        Documents within the token budget are sent whole and the prompt is built
+        once per module and document content, keeping it byte-identical for prompt
+        caching. Longer documents are indexed once and the excerpts most relevant
+        to the query are sent instead of blindly truncating the start of the document.
+        """
+        digest = hashlib.blake2b(document_content.encode('utf-8', 'ignore'), digest_size=16).digest()
+        cache_key = (module_id, digest)
+        with self._doc_cache_lock:
+            cached = self._doc_cache.get(cache_key)
+            if cached is not None:
+                self._doc_cache.move_to_end(cache_key)
         
-        # Language-specific instructions
-        language_instructions = self._get_language_specific_instructions(language_code, language_name)
+        if cached is None:
+            if self._count_tokens(document_content) <= self.max_content_tokens:
+                document_prompt = template.substitute(document_content=document_content, **fields)
+                cached = (document_prompt, None)
+            else:
+                cached = (None, DocumentIndex(document_content, length_fn=self._count_tokens))
+            with self._doc_cache_lock:
+                self._doc_cache[cache_key] = cached
+                while len(self._doc_cache) > _DOC_CACHE_SIZE:
+                    self._doc_cache.popitem(last=False)
         
-        base_prompt = f"""You are an expert academic assistant for University of Roehampton students. You are helping with the module: "{module_name}" from the {programme} programme.
-
-{document_info}
-
-DOCUMENT CONTENT:
-{truncated_content}
-
-INSTRUCTIONS:
-- Answer questions based ONLY on the provided document content
-- If multiple documents are provided, clearly indicate which document contains specific information using the format **[Source: Document Name]**
-- When referencing content, use the file names shown above for clarity
-- Be helpful and educational, explaining concepts clearly
-- If information isn't in the document(s), say so clearly
-- Provide specific references to sections when possible
-- Help with coursework understanding, but don't do the work for the student
-- Encourage critical thinking and learning
-- Be supportive and encouraging
-
-CONTEXT:
-- Module: {module_name}
-- Programme: {programme}
-- Materials: {coursework_type}
-
-{language_instructions}
-
-Remember: You are helping a Roehampton University student understand their coursework materials. Always cite your sources when multiple documents are available."""
+        if cached[0] is not None:
+            return cached[0]
         
-        return base_prompt
+        excerpts = cached[1].select(query, self.max_content_tokens)
+        return template.substitute(document_content=excerpts, **fields)
     
-    def _create_ethics_system_prompt(self, document_content: str, student_id: str, 
-                                   programme: str, language_code: str, language_name: str) -> str:
-        """Create system prompt for ethics assistance with language specification"""
-        
-        # Language-specific instructions
-        language_instructions = self._get_language_specific_instructions(language_code, language_name)
+    def _get_scaffold(self, scaffolds: Dict[str, str], template: Template,
+                      language_code: str, language_name: str) -> str:
+        """Get the precomputed static scaffold for a language"""
+        scaffold = scaffolds.get(language_code)
+        if scaffold is None:
+            language_instructions = self._get_language_specific_instructions(language_code, language_name)
+            scaffold = template.substitute(language_instructions=language_instructions)
+        return scaffold
+    
+    def _create_coursework_messages(self, question: str, document_content: str, document_info: str,
+                                    module_info: Dict, language_code: str, language_name: str,
+                                    query: Optional[str] = None) -> List[Dict]:
+        """Create the chat messages for coursework assistance, static prefix first"""
+        module_name = module_info.get('module', 'Unknown Module')
+        programme = module_info.get('programme', 'Unknown Programme')
+        coursework_type = module_info.get('coursework_type', 'Course Materials')
         
-        base_prompt = f"""You are an expert ethics advisor for University of Roehampton students. You are helping with ethics guidance based on the "Reforming Modernity" document.
-
-STUDENT INFORMATION:
-- Student ID: {student_id}
-- Programme: {programme}
-
-ETHICS DOCUMENT CONTENT:
-{document_content}
-
-INSTRUCTIONS:
-- Answer ethics questions based ONLY on the provided "Reforming Modernity" document content
-- Provide thoughtful, well-reasoned ethical guidance based on what's actually in the document
-- Reference specific sections, concepts, or examples from the document when relevant
-- If the document discusses specific ethical frameworks, theories, or principles, use those
-- Help students understand and apply the ethical concepts presented in this document
-- Encourage critical thinking about ethical issues as presented in the material
-- Be supportive and educational in your approach
-- If a question cannot be answered from the document content, clearly state this and suggest what topics the document does cover
-- Always maintain academic integrity and professional ethics standards
+        module_id = f"{module_name}|{module_info.get('pdf_file', '')}"
+        document_prompt = self._get_document_prompt(
+            module_id, document_content, query or question, COURSEWORK_DOCUMENT_TEMPLATE,
+            module_name=module_name, programme=programme,
+            document_info=document_info, coursework_type=coursework_type
+        )
 
-CONTEXT:
-- Document: Reforming Modernity (University Ethics Material)
-- Purpose: Ethics guidance based on this specific document
-- Audience: Roehampton University student
+        return [
+            {"role": "system", "content": self._get_scaffold(
+                self._coursework_scaffolds, COURSEWORK_SCAFFOLD, language_code, language_name)},
+            {"role": "system", "content": document_prompt},
+            {"role": "user", "content": question}
+        ]
 
-{language_instructions}
+    def _create_ethics_messages(self, question: str, document_content: str, student_id: str,
+                                programme: str, language_code: str, language_name: str,
+                                query: Optional[str] = None) -> List[Dict]:
+        """Create the chat messages for ethics assistance, static prefix first"""
+        document_prompt = self._get_document_prompt(
+            'ethics', document_content, query or question, ETHICS_DOCUMENT_TEMPLATE
+        )
+        student_context = STUDENT_CONTEXT_TEMPLATE.substitute(student_id=student_id, programme=programme)
 
-Remember: Base your responses strictly on the actual content of the "Reforming Modernity" document. If the document focuses on specific ethical themes, theories, or applications, emphasize those in your responses."""
-        
-        return base_prompt
+        return [
+            {"role": "system", "content": self._get_scaffold(
+                self._ethics_scaffolds, ETHICS_SCAFFOLD, language_code, language_name)},
+            {"role": "system", "content": document_prompt},
+            {"role": "user", "content": student_context + question}
+        ]
     
     def _get_language_specific_instructions(self, language_code: str, language_name: str) -> str:
         """Get language-specific instructions for the AI"""
-        if language_code == 'en':
-            return "LANGUAGE: Respond in English."
-        
-        elif language_code == 'ar':
-            return f"""LANGUAGE REQUIREMENTS:
-- RESPOND ENTIRELY IN ARABIC ({language_name})
-- Use proper Arabic grammar and formal academic language
-- Write from right to left as appropriate for Arabic
-- Use Arabic academic terminology when available
-- Maintain respectful and formal tone appropriate for Arabic academic context
-- If you need to reference English terms or names, you may include them in parentheses after the Arabic translation"""
-        
-        elif language_code == 'fr':
-            return f"""LANGUAGE REQUIREMENTS:
-- RESPOND ENTIRELY IN FRENCH ({language_name})
-- Use proper French grammar and academic language
-- Use formal "vous" form when addressing the student
-- Use French academic terminology when available
-- Maintain professional and supportive tone appropriate for French academic context
-- Use proper French accents and punctuation"""
-        
-        elif language_code == 'es':
-            return f"""LANGUAGE REQUIREMENTS:
-- RESPOND ENTIRELY IN SPANISH ({language_name})
-- Use proper Spanish grammar and academic language
-- Use formal "usted" form when addressing the student
-- Use Spanish academic terminology when available
-- Maintain professional and supportive tone appropriate for Spanish academic context
-- Use proper Spanish accents and punctuation"""
-        
-        else:
-            return f"LANGUAGE: Respond in {language_name}."
+        return self._LANG_INSTRUCTIONS.get(language_code, f"LANGUAGE: Respond in {language_name}.")
     
     def test_connection(self) -> tuple[bool, str]:
         """Test the OpenAI connection"""
@@ -298,3 +827,9 @@ Remember: Base your responses strictly on the actual content of the "Reforming M
             return True, "Connection successful"
         except Exception as e:
             return False, f"Connection failed: {str(e)}"
+
+
+@st.cache_resource(show_spinner=False)
+def get_assistant() -> AIAssistant:
+    """Get the process-wide AIAssistant; use this instead of constructing AIAssistant()"""
+    return AIAssistant()
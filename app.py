@@ -3,39 +3,127 @@
 import streamlit as st
 import logging
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 
-# Import our modules
+# Import our modules. The AI assistant, conversation flows and ethics handler
+# are imported on first use so the welcome screen doesn't pay for them.
 from config import Config
 from session_manager import SessionManager
 from database_manager import DatabaseManager
-from ai_assistant import AIAssistant
 from audio_manager import AudioManager
 from ui_components import UIComponents
-from conversation_flows import ConversationFlows
 from localization import init_language_system, t
 
-# Import ethics handler if available
-try:
-    from ethics_handler import render_ethics_chat_interface
-    ETHICS_AVAILABLE = True
-except ImportError:
-    ETHICS_AVAILABLE = False
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Static help text, pre-rendered as HTML so reruns skip markdown parsing
+SETUP_INSTRUCTIONS_HTML = """
+<ol>
+    <li><strong>Create a <code>.env</code> file</strong> with your OpenAI API key:
+        <pre><code>OPENAI_API_KEY=your_api_key_here</code></pre></li>
+    <li><strong>Create required folders:</strong>
+        <ul>
+            <li><code>data/</code> - for your documents</li>
+            <li><code>assets/</code> - for logos and images</li>
+        </ul></li>
+    <li><strong>Add your student data file:</strong> <code>student_modules_with_pdfs.xlsx</code></li>
+    <li><strong>Add ethics document:</strong> <code>data/reforming_modernity.pdf</code></li>
+</ol>
+"""
+
+SCREEN_ERROR_STEPS_HTML = """
+<ol>
+    <li><strong>Refresh the page</strong> and try again</li>
+    <li><strong>Check your session state</strong> - you may need to restart</li>
+    <li><strong>Verify your data files</strong> - ensure all required files exist</li>
+    <li><strong>Check the logs</strong> for more detailed error information</li>
+    <li><strong>Restart the application</strong> if the problem persists</li>
+</ol>
+"""
+
+CRITICAL_ERROR_STEPS_HTML = """
+<ol>
+    <li><strong>Refresh the page</strong> and try again</li>
+    <li><strong>Check your .env file</strong> - ensure OPENAI_API_KEY is set</li>
+    <li><strong>Verify your data files</strong> - ensure all required files exist</li>
+    <li><strong>Check file permissions</strong> - ensure the app can read your files</li>
+    <li><strong>Restart the application</strong> if the problem persists</li>
+</ol>
+"""
+
+QUICK_SETUP_HTML = """
+<ol>
+    <li>Create a <code>.env</code> file with: <code>OPENAI_API_KEY=your_key_here</code></li>
+    <li>Create folders: <code>data/</code>, <code>assets/</code></li>
+    <li>Add your Excel file: <code>student_modules_with_pdfs.xlsx</code></li>
+    <li>Add ethics document: <code>data/reforming_modernity.pdf</code></li>
+</ol>
+"""
+
+@st.cache_resource(show_spinner=False)
+def get_loader_executor() -> ThreadPoolExecutor:
+    """Process-wide worker for loading the student database off the script thread"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="database-loader")
+
+def show_error_details(error: Exception, label: str):
+    """Show an exception's traceback in a collapsed expander"""
+    # Expanders open client-side, so viewing details doesn't rerun the script
+    with st.expander(label):
+        st.code("".join(traceback.format_exception(type(error), error, error.__traceback__)))
+
+def get_ethics_interface():
+    """Import the ethics chat interface on first use; returns None if unavailable"""
+    try:
+        from ethics_handler import render_ethics_chat_interface
+        return render_ethics_chat_interface
+    except ImportError as e:
+        logger.warning("Ethics handler unavailable: %s", e)
+        return None
+
 class UniversityChatbot:
-    """Main University Chatbot Application with multi-language support"""
+    """
+    Main University Chatbot Application with multi-language support
+    
+    A single instance is shared by all sessions (see get_app), so per-session
+    data must live in st.session_state rather than on the object.
+    """
+    
+    # Conversation steps rendered by ConversationFlows: step -> method name
+    FLOW_SCREENS = {
+        'student_id': 'render_student_id_input',
+        'code': 'render_code_input',
+        'module': 'render_module_selection',
+        'coursework': 'render_coursework_selection',
+        'chat': 'render_chat_interface'
+    }
     
     def __init__(self):
-        self.setup_page_config()
-        self.ai_assistant = AIAssistant()
         self.audio_manager = AudioManager()
         self.ui_components = UIComponents(self.audio_manager)
-        self.conversation_flows = ConversationFlows(self.ai_assistant, self.audio_manager)
         
-    def setup_page_config(self):
+        # Screen renderers by conversation step; flow screens are bound on first use
+        self._screen_handlers = {
+            'welcome': self.ui_components.render_welcome_screen,
+            'ethics_chat': self.render_ethics_interface
+        }
+    
+    @cached_property
+    def ai_assistant(self):
+        """Shared AI assistant, imported and created on first use"""
+        from ai_assistant import get_assistant
+        return get_assistant()
+    
+    @cached_property
+    def conversation_flows(self):
+        """Conversation flows, imported and created on first use"""
+        from conversation_flows import ConversationFlows
+        return ConversationFlows(self.ai_assistant, self.audio_manager)
+        
+    @staticmethod
+    def setup_page_config():
         """Configure Streamlit page settings"""
         st.set_page_config(
             page_title=Config.PROJECT_NAME,
@@ -65,16 +153,28 @@ class UniversityChatbot:
             self.load_database()
             
         except Exception as e:
-            logger.error(f"Error initializing app: {e}")
+            logger.error("Error initializing app: %s", e)
             st.error(f"Initialization error: {str(e)}")
     
     def load_database(self):
-        """Load student database with translation support"""
+        """Load student database in the background, waiting only on screens that need it"""
         if not st.session_state.database_loaded:
+            future = st.session_state.database_future
+            if future is None:
+                future = get_loader_executor().submit(DatabaseManager.load_student_database)
+                st.session_state.database_future = future
+            
             loading_message = t('loading_docs', default="Loading student database...")
+            
+            # The welcome screen doesn't need the database, so render it right away
+            if not future.done() and st.session_state.conversation_step == 'welcome':
+                st.caption(f"⏳ {loading_message}")
+                return
+            
             with st.spinner(loading_message):
                 try:
-                    database, message = DatabaseManager.load_student_database()
+                    database, message = future.result()
+                    st.session_state.database_future = None
                     if database:
                         st.session_state.student_database = database
                         st.session_state.database_loaded = True
@@ -85,10 +185,24 @@ class UniversityChatbot:
                         self.show_setup_error(message)
                         st.stop()
                 except Exception as e:
-                    logger.error(f"Database loading error: {e}")
+                    st.session_state.database_future = None
+                    logger.error("Database loading error: %s", e)
                     st.error(f"Database error: {str(e)}")
                     st.stop()
     
+    def poll_database(self):
+        """Check back on a timer while the database is still loading in the background"""
+        if not st.session_state.database_loaded and st.session_state.get('database_future') is not None:
+            self._render_database_poll()
+    
+    @st.fragment(run_every=Config.DATABASE_POLL_INTERVAL)
+    def _render_database_poll(self):
+        """Poll the background load without rerunning the page until it has finished"""
+        future = st.session_state.get('database_future')
+        if future is None or future.done():
+            # One full rerun picks up the database and stops this fragment's timer
+            st.rerun()
+    
     def show_setup_error(self, message: str):
         """Show setup error information with translation support"""
         st.error(f"❌ **{t('setup_error', default='Setup Error')}:** {message}")
@@ -101,76 +215,50 @@ class UniversityChatbot:
                 st.markdown(f"- ❌ {error}")
             
             st.markdown(f"### {t('setup_instructions', default='Setup Instructions')}:")
-            st.markdown("""
-            1. **Create a `.env` file** with your OpenAI API key:
-               ```
-               OPENAI_API_KEY=your_api_key_here
-               ```
-            
-            2. **Create required folders:**
-               - `data/` - for your documents
-               - `assets/` - for logos and images
-            
-            3. **Add your student data file:** `student_modules_with_pdfs.xlsx`
-            
-            4. **Add ethics document:** `data/reforming_modernity.pdf`
-            """)
+            st.html(SETUP_INSTRUCTIONS_HTML)
     
-    def render_current_screen(self):
+    def render_current_screen(self, step: str):
         """Render the appropriate screen based on conversation step"""
-        step = st.session_state.conversation_step
-        
         try:
-            if step == 'welcome':
-                self.ui_components.render_welcome_screen()
-            
-            elif step == 'student_id':
-                self.conversation_flows.render_student_id_input()
-            
-            elif step == 'code':
-                self.conversation_flows.render_code_input()
-            
-            elif step == 'module':
-                self.conversation_flows.render_module_selection()
-            
-            elif step == 'coursework':
-                self.conversation_flows.render_coursework_selection()
-            
-            elif step == 'chat':
-                self.conversation_flows.render_chat_interface()
-            
-            elif step == 'ethics_chat':
-                self.render_ethics_interface()
-            
+            handler = self._get_screen_handler(step)
+            if handler:
+                handler()
             else:
-                unknown_step_msg = t('unknown_step', default="Unknown conversation step. Please restart.")
-                st.error(unknown_step_msg)
-                if st.button(f"🔄 {t('start_over')}"):
-                    SessionManager.reset_conversation()
-                    st.rerun()
+                self.render_unknown_step()
                     
         except Exception as e:
-            logger.error(f"Error rendering screen {step}: {e}")
+            logger.error("Error rendering screen %s: %s", step, e)
             self.show_screen_error(e)
     
+    def _get_screen_handler(self, step: str):
+        """Get the renderer for a conversation step, binding flow screens once"""
+        handler = self._screen_handlers.get(step)
+        if handler is None and step in self.FLOW_SCREENS:
+            handler = getattr(self.conversation_flows, self.FLOW_SCREENS[step])
+            self._screen_handlers[step] = handler
+        return handler
+    
+    def render_unknown_step(self):
+        """Render the recovery screen for an unknown conversation step"""
+        unknown_step_msg = t('unknown_step', default="Unknown conversation step. Please restart.")
+        st.error(unknown_step_msg)
+        st.button(f"🔄 {t('start_over')}", on_click=SessionManager.reset_conversation)
+    
     def render_ethics_interface(self):
         """Render ethics chat interface with translation support"""
-        if ETHICS_AVAILABLE:
+        render_ethics_chat_interface = get_ethics_interface()
+        if render_ethics_chat_interface:
             try:
                 render_ethics_chat_interface()
             except Exception as e:
-                logger.error(f"Error in ethics interface: {e}")
+                logger.error("Error in ethics interface: %s", e)
                 st.error(f"Ethics interface error: {str(e)}")
-                if st.button(f"🔙 {t('back_button')}"):
-                    st.session_state.conversation_step = 'welcome'
-                    st.rerun()
+                st.button(f"🔙 {t('back_button')}", on_click=SessionManager.set_step, args=('welcome',))
         else:
             ethics_unavailable_msg = t('ethics_unavailable', default="Ethics assistance is not available.")
             st.error(ethics_unavailable_msg)
             st.info("Please ensure 'reforming_modernity.pdf' is in your data folder and ethics_handler.py is properly configured.")
-            if st.button(f"🔙 {t('back_button')}"):
-                st.session_state.conversation_step = 'welcome'
-                st.rerun()
+            st.button(f"🔙 {t('back_button')}", on_click=SessionManager.set_step, args=('welcome',))
     
     def render_sidebar(self):
         """Render sidebar with controls and information"""
@@ -178,18 +266,18 @@ class UniversityChatbot:
             database_stats = DatabaseManager.get_database_stats()
             self.ui_components.render_sidebar(database_stats)
         except Exception as e:
-            logger.error(f"Error rendering sidebar: {e}")
+            logger.error("Error rendering sidebar: %s", e)
             with st.sidebar:
                 st.error(f"Sidebar error: {str(e)}")
     
-    def render_progress_indicator(self):
+    def render_progress_indicator(self, step: str):
         """Render progress indicator if not on welcome screen"""
-        if st.session_state.conversation_step != 'welcome':
+        if step != 'welcome':
             try:
                 self.ui_components.render_progress_indicator()
                 st.markdown("---")
             except Exception as e:
-                logger.error(f"Error rendering progress indicator: {e}")
+                logger.error("Error rendering progress indicator: %s", e)
     
     def show_screen_error(self, error: Exception):
         """Show error information for screen rendering issues with translation support"""
@@ -198,31 +286,36 @@ class UniversityChatbot:
         
         # Show detailed error information for debugging
         debug_label = t('show_debug', default="Show detailed error information (for debugging)")
-        if st.checkbox(debug_label):
-            st.code(traceback.format_exc())
+        show_error_details(error, debug_label)
         
         try_following_msg = t('try_following', default="Please try the following:")
         st.info(try_following_msg)
-        st.markdown("""
-        1. **Refresh the page** and try again
-        2. **Check your session state** - you may need to restart
-        3. **Verify your data files** - ensure all required files exist
-        4. **Check the logs** for more detailed error information
-        5. **Restart the application** if the problem persists
-        """)
+        st.html(SCREEN_ERROR_STEPS_HTML)
         
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button(f"🔄 {t('start_over')}"):
-                # Clear all session state
-                for key in list(st.session_state.keys()):
-                    del st.session_state[key]
-                st.rerun()
+        # One control for both recovery actions; the callback runs before the rerun
+        action_labels = {
+            'reset': f"🔄 {t('start_over')}",
+            'welcome': f"🏠 {t('back_to_welcome')}"
+        }
+        st.segmented_control(
+            try_following_msg,
+            options=list(action_labels),
+            format_func=action_labels.get,
+            label_visibility="collapsed",
+            key="screen_error_action",
+            on_change=self._on_screen_error_action
+        )
         
-        with col2:
-            if st.button(f"🏠 {t('back_to_welcome')}"):
-                st.session_state.conversation_step = 'welcome'
-                st.rerun()
+    @staticmethod
+    def _on_screen_error_action():
+        """Apply the recovery action chosen on the screen error page"""
+        action = st.session_state.get('screen_error_action')
+        if action == 'reset':
+            SessionManager.clear_session()
+        elif action == 'welcome':
+            SessionManager.set_step('welcome')
+            # Deselect so the control is fresh if the error screen shows again
+            st.session_state.screen_error_action = None
     
     def run(self):
         """Main application runner"""
@@ -234,73 +327,42 @@ class UniversityChatbot:
             self.render_sidebar()
             
             # Render progress indicator
-            self.render_progress_indicator()
+            step = st.session_state.conversation_step
+            self.render_progress_indicator(step)
             
             # Render current screen
-            self.render_current_screen()
+            self.render_current_screen(step)
             
+            # Pick up the database once the background load finishes
+            self.poll_database()
+        
         except Exception as e:
-            logger.error(f"Critical application error: {e}")
+            logger.error("Critical application error: %s", e)
             
             critical_error_msg = t('critical_error', default='Critical Application Error')
             st.error(f"🚨 **{critical_error_msg}**: {str(e)}")
             
             # Show detailed error information for debugging
             debug_label = t('show_debug', default="Show detailed error information (for debugging)")
-            if st.checkbox(debug_label):
-                st.code(traceback.format_exc())
+            show_error_details(e, debug_label)
             
             try_following_msg = t('try_following', default="Please try the following:")
             st.info(try_following_msg)
-            st.markdown("""
-            1. **Refresh the page** and try again
-            2. **Check your .env file** - ensure OPENAI_API_KEY is set
-            3. **Verify your data files** - ensure all required files exist
-            4. **Check file permissions** - ensure the app can read your files
-            5. **Restart the application** if the problem persists
-            """)
+            st.html(CRITICAL_ERROR_STEPS_HTML)
             
-            if st.button(f"🔄 {t('start_over')}"):
-                # Clear all session state
-                for key in list(st.session_state.keys()):
-                    del st.session_state[key]
-                st.rerun()
+            st.button(f"🔄 {t('start_over')}", on_click=SessionManager.clear_session)
 
-def validate_environment():
-    """Validate environment and configuration"""
-    try:
-        # Check if required modules can be imported
-        required_modules = [
-            'config', 'session_manager', 'database_manager', 
-            'ai_assistant', 'audio_manager', 'ui_components', 
-            'conversation_flows', 'localization'
-        ]
-        
-        missing_modules = []
-        for module in required_modules:
-            try:
-                __import__(module)
-            except ImportError as e:
-                missing_modules.append(f"{module}: {str(e)}")
-        
-        return len(missing_modules) == 0, missing_modules
-        
-    except Exception as e:
-        return False, [f"Environment validation error: {str(e)}"]
+@st.cache_resource(show_spinner=False)
+def get_app() -> UniversityChatbot:
+    """Get the application instance, created once per process"""
+    return UniversityChatbot()
 
 def main():
     """Application entry point"""
+    # Page config must be the first Streamlit call on every run
+    UniversityChatbot.setup_page_config()
+    
     try:
-        # Validate environment first
-        env_valid, env_errors = validate_environment()
-        if not env_valid:
-            st.error("❌ **Environment Error**")
-            st.markdown("### Missing modules or import errors:")
-            for error in env_errors:
-                st.markdown(f"- {error}")
-            st.markdown("### Please check your installation and file structure.")
-            return
-        
         # Validate configuration
         is_valid, errors = Config.validate_setup()
         
@@ -314,31 +376,24 @@ def main():
                 st.markdown(f"- {error}")
             
             quick_setup_msg = t('quick_setup', default='Quick Setup')
-            st.markdown(f"""
-            ### {quick_setup_msg}:
-            1. Create a `.env` file with: `OPENAI_API_KEY=your_key_here`
-            2. Create folders: `data/`, `assets/`
-            3. Add your Excel file: `student_modules_with_pdfs.xlsx`
-            4. Add ethics document: `data/reforming_modernity.pdf`
-            """)
+            st.markdown(f"### {quick_setup_msg}:")
+            st.html(QUICK_SETUP_HTML)
             return
         
-        # Create and run the application
-        app = UniversityChatbot()
-        app.run()
+        # Run the shared application instance
+        get_app().run()
         
     except Exception as e:
         startup_error_msg = f"Failed to start application: {e}"
         st.error(startup_error_msg)
-        logger.error(f"Startup error: {e}")
+        logger.error("Startup error: %s", e)
         
         # Show detailed error for debugging
-        if st.checkbox("Show startup error details"):
-            st.code(traceback.format_exc())
+        show_error_details(e, "Show startup error details")
         
+        # Clicking the button reruns the script, which is the retry
         retry_msg = t('retry', default='Retry')
-        if st.button(f"🔄 {retry_msg}"):
-            st.rerun()
+        st.button(f"🔄 {retry_msg}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
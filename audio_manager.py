@@ -1,35 +1,135 @@
 # audio_manager.py - Audio response generation and text-to-speech
 
-import base64
+import asyncio
+import hashlib
+import os
 import re
-import time
 import logging
+import tempfile
+import threading
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import Optional
-from openai import OpenAI
+from typing import Iterator, List, Optional
+from openai import AsyncOpenAI, OpenAI
+import streamlit as st
+
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Single-pass markdown cleanup: headers, **bold**, *italic*, _italic_, `code`,
+# [text](url), line breaks and whitespace runs, dispatched by _clean_token.
+# Negated, bounded classes keep unterminated markers (e.g. truncated output) linear.
+_RE_CLEAN = re.compile(
+    r'(?P<header>^#+[^\S\n]*)'
+    r'|\*\*(?P<bold>[^*\n]{1,500})\*\*|\*(?P<italic>[^*\n]{1,500})\*|_(?P<underscore>[^_\n]{1,500})_'
+    r'|`(?P<code>[^`\n]{1,500})`|\[(?P<link>[^\]\n]{1,500})\]\([^)\s]{1,2000}\)'
+    r'|(?P<newline>[^\S\n]*\n\s*)|(?P<space>\s+)',
+    flags=re.MULTILINE
+)
+_TOKEN_REPLACEMENTS = {'header': '', 'newline': '. ', 'space': ' '}
+_RE_WHITESPACE = re.compile(r'\s+')
+_CODE_FENCE = '```'
+_SENTENCE_END_CHARS = '.!?'
+# Plain ASCII text without these characters needs only whitespace cleanup
+_MARKDOWN_SENTINELS = frozenset('*`#[_\n')
+_STREAM_CHUNK_SIZE = 4096
+# Interface emojis (and their variation selectors) deleted before speech
+_EMOJI_TABLE = str.maketrans('', '', '🔑📄📚⚠️❌✅🤖🙋📊💾⏱️🔧🗑️🔄🔍🚨📁🎓📋🆔🔐')
+
+# TTS settings resolved once at import instead of on every request
+_OPENAI_API_KEY = Config.OPENAI_API_KEY
+_TTS_MODEL = Config.TTS_MODEL
+_TTS_VOICE = Config.TTS_VOICE
+_TTS_FORMAT = Config.TTS_FORMAT
+_TTS_CACHE_MAX_BYTES = Config.TTS_CACHE_MAX_MB * 1024 * 1024
+# Eviction trims the cache to this, leaving headroom so the next scan is many clips away
+_TTS_CACHE_TRIM_BYTES = _TTS_CACHE_MAX_BYTES * 8 // 10
+_AUDIO_DIR = Path(Config.AUDIO_FOLDER)
+_AUDIO_MIME_TYPE = Config.TTS_MIME_TYPES.get(_TTS_FORMAT, 'audio/mpeg')
+
+# Running size of the audio cache folder, so the folder is only scanned when over the cap
+_cache_size: Optional[int] = None
+_cache_size_lock = threading.Lock()
+
+
+def _clean_token(match: re.Match) -> str:
+    """Replace a markdown or whitespace token with its spoken form"""
+    kind = match.lastgroup
+    replacement = _TOKEN_REPLACEMENTS.get(kind)
+    if replacement is not None:
+        return replacement
+    # Inline markup keeps its text, with whitespace runs inside the span collapsed
+    return _RE_WHITESPACE.sub(' ', match.group(kind))
+
+
+def _strip_code_fences(text: str) -> str:
+    """Remove closed ``` code blocks, leaving an unterminated fence as-is"""
+    parts = []
+    position = 0
+    while (start := text.find(_CODE_FENCE, position)) != -1:
+        end = text.find(_CODE_FENCE, start + len(_CODE_FENCE))
+        if end == -1:
+            break
+        parts.append(text[position:start])
+        position = end + len(_CODE_FENCE)
+    if not parts:
+        return text
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=512)
+def clean_text_for_tts(text: str) -> str:
+    """
+    Clean text for text-to-speech by removing markdown and formatting
+    
+    Args:
+        text: Raw text with potential markdown
+        
+    Returns:
+        Cleaned text suitable for TTS
+    """
+    if not text:
+        return ""
+    
+    if text.isascii() and _MARKDOWN_SENTINELS.isdisjoint(text):
+        # No markdown or emojis, so only collapse whitespace
+        text = ' '.join(text.split())
+    else:
+        # Remove code blocks and emojis for better TTS
+        text = _strip_code_fences(text)
+        text = text.translate(_EMOJI_TABLE)
+        
+        # Strip headers and inline markup and collapse line breaks and spaces in one scan
+        text = _RE_CLEAN.sub(_clean_token, text).strip()
+    
+    # Ensure proper sentence ending
+    if text and text[-1] not in _SENTENCE_END_CHARS:
+        text += '.'
+    
+    return text
+
+
 class AudioManager:
     """Manages audio response generation and text-to-speech functionality"""
     
     def __init__(self):
-        self.client = None
-        if Config.OPENAI_API_KEY:
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
-        self._ensure_audio_folder()
-    
-    def _ensure_audio_folder(self):
-        """Create audio folder if it doesn't exist"""
-        audio_path = Path(Config.AUDIO_FOLDER)
-        audio_path.mkdir(exist_ok=True)
-        temp_audio_path = Path(Config.TEMP_AUDIO_FOLDER)
-        temp_audio_path.mkdir(exist_ok=True)
+        Config.ensure_folders()
+    
+    @cached_property
+    def client(self) -> Optional[OpenAI]:
+        """OpenAI client, created on first use so text-only sessions never build it"""
+        return OpenAI(api_key=_OPENAI_API_KEY) if _OPENAI_API_KEY else None
+    
+    @cached_property
+    def async_client(self) -> Optional[AsyncOpenAI]:
+        """AsyncOpenAI client, created on first use"""
+        return AsyncOpenAI(api_key=_OPENAI_API_KEY) if _OPENAI_API_KEY else None
     
     def is_available(self) -> bool:
         """Check if audio generation is available"""
-        return self.client is not None
+        return bool(_OPENAI_API_KEY)
     
     def generate_audio_response(self, text: str, voice: str = None) -> Optional[bytes]:
         """
@@ -42,130 +142,219 @@ class AudioManager:
         Returns:
             Audio bytes or None if failed
         """
-        if not self.client:
-            logger.error("OpenAI client not initialized")
+        clean_text = self._prepare_tts_input(text)
+        if clean_text is None:
             return None
         
-        if not text or not text.strip():
-            logger.error("No text provided for audio generation")
+        selected_voice = voice or _TTS_VOICE
+        cache_path = self._cache_path(clean_text, selected_voice)
+        cached = self._read_cached_audio(cache_path)
+        if cached is not None:
+            return cached
+        
+        try:
+            audio_bytes = b''.join(self._iter_speech(clean_text, selected_voice))
+        except Exception as e:
+            logger.error(f"Error generating audio: {e}")
             return None
         
-        # Clean text for TTS (remove markdown and excessive formatting)
-        clean_text = self.clean_text_for_tts(text)
+        if not audio_bytes:
+            return None
+        self._store_cached_audio(cache_path, audio_bytes)
+        return audio_bytes
+    
+    def generate_audio_response_stream(self, text: str, voice: str = None) -> Iterator[bytes]:
+        """Stream audio chunks as OpenAI TTS synthesizes them"""
+        clean_text = self._prepare_tts_input(text)
+        if clean_text is None:
+            return
         
-        # Use provided voice or default
-        selected_voice = voice or Config.TTS_VOICE
+        selected_voice = voice or _TTS_VOICE
+        cache_path = self._cache_path(clean_text, selected_voice)
+        cached = self._read_cached_audio(cache_path)
+        if cached is not None:
+            for start in range(0, len(cached), _STREAM_CHUNK_SIZE):
+                yield cached[start:start + _STREAM_CHUNK_SIZE]
+            return
         
+        chunks = []
         try:
-            # Generate audio using OpenAI TTS
-            response = self.client.audio.speech.create(
-                model=Config.TTS_MODEL,
+            for chunk in self._iter_speech(clean_text, selected_voice):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming audio: {e}")
+            return
+        
+        if chunks:
+            self._store_cached_audio(cache_path, b''.join(chunks))
+    
+    async def agenerate_audio_response(self, text: str, voice: str = None,
+                                       client: Optional[AsyncOpenAI] = None) -> Optional[bytes]:
+        """Async variant of generate_audio_response for concurrent synthesis"""
+        clean_text = self._prepare_tts_input(text)
+        if clean_text is None:
+            return None
+        
+        selected_voice = voice or _TTS_VOICE
+        cache_path = self._cache_path(clean_text, selected_voice)
+        cached = self._read_cached_audio(cache_path)
+        if cached is not None:
+            return cached
+        
+        try:
+            async with (client or self.async_client).audio.speech.with_streaming_response.create(
+                model=_TTS_MODEL,
                 voice=selected_voice,
                 input=clean_text,
-                response_format="mp3"
-            )
-            
-            # Return audio bytes
-            return response.content
-            
+                response_format=_TTS_FORMAT
+            ) as response:
+                audio_bytes = await response.read()
         except Exception as e:
             logger.error(f"Error generating audio: {e}")
             return None
+        
+        if not audio_bytes:
+            return None
+        self._store_cached_audio(cache_path, audio_bytes)
+        return audio_bytes
     
-    def clean_text_for_tts(self, text: str) -> str:
+    def generate_audio_batch(self, texts: List[str], voice: str = None) -> List[Optional[bytes]]:
         """
-        Clean text for text-to-speech by removing markdown and formatting
+        Generate audio for several texts concurrently
+        
+        Requests run in parallel, bounded by Config.MAX_CONCURRENT_REQUESTS.
+        Must be called from synchronous code, not from inside a running event loop.
         
         Args:
-            text: Raw text with potential markdown
+            texts: Texts to convert to speech
+            voice: Voice to use (defaults to Config.TTS_VOICE)
             
         Returns:
-            Cleaned text suitable for TTS
+            Audio bytes (or None if failed) in the same order as the texts
         """
-        if not text:
-            return ""
+        if not self.is_available():
+            logger.error("OpenAI API key not configured")
+            return [None] * len(texts)
         
-        # Remove markdown formatting
-        # Remove bold/italic markers
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # **bold**
-        text = re.sub(r'\*(.*?)\*', r'\1', text)      # *italic*
-        text = re.sub(r'_(.*?)_', r'\1', text)        # _italic_
+        async def run_all() -> List[Optional[bytes]]:
+            semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_REQUESTS)
+            
+            # asyncio.run creates a fresh event loop, so use a client scoped to it
+            async with AsyncOpenAI(api_key=_OPENAI_API_KEY) as client:
+                async def synthesize(text: str) -> Optional[bytes]:
+                    async with semaphore:
+                        return await self.agenerate_audio_response(text, voice, client=client)
+                
+                return await asyncio.gather(*(synthesize(text) for text in texts))
         
-        # Remove headers
-        text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
+        return asyncio.run(run_all())
+    
+    def _prepare_tts_input(self, text: str) -> Optional[str]:
+        """Validate the request and return the cleaned text, or None if it cannot be spoken"""
+        if not self.is_available():
+            logger.error("OpenAI API key not configured")
+            return None
         
-        # Remove code blocks
-        text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-        text = re.sub(r'`([^`]+)`', r'\1', text)
+        if not text or not text.strip():
+            logger.error("No text provided for audio generation")
+            return None
         
-        # Remove links but keep text
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+        # Clean text for TTS (remove markdown and excessive formatting)
+        return self.clean_text_for_tts(text)
         
-        # Remove special characters and emojis for better TTS
-        text = re.sub(r'[🔑📄📚⚠️❌✅🤖🙋📊💾⏱️🔧🗑️🔄🔍🚨📁🎓📋🆔🔐]', '', text)
+    def _iter_speech(self, clean_text: str, voice: str) -> Iterator[bytes]:
+        """Yield audio chunks from the streaming TTS endpoint as they arrive"""
+        with self.client.audio.speech.with_streaming_response.create(
+            model=_TTS_MODEL,
+            voice=voice,
+            input=clean_text,
+            response_format=_TTS_FORMAT
+        ) as response:
+            yield from response.iter_bytes(chunk_size=_STREAM_CHUNK_SIZE)
+    
+    @staticmethod
+    def _cache_path(clean_text: str, voice: str) -> Path:
+        """Content-addressed cache file for a model, voice and text"""
+        key = hashlib.sha256(f"{_TTS_MODEL}|{voice}|{clean_text}".encode('utf-8')).hexdigest()
+        return _AUDIO_DIR / f"{key}.{_TTS_FORMAT}"
+    
+    @staticmethod
+    def _read_cached_audio(path: Path) -> Optional[bytes]:
+        """Return cached audio, marking it recently used, or None on a miss"""
+        if _TTS_CACHE_MAX_BYTES <= 0:
+            return None
+        try:
+            audio_bytes = path.read_bytes()
+            os.utime(path)
+            return audio_bytes
+        except OSError:
+            return None
+    
+    def _store_cached_audio(self, path: Path, audio_bytes: bytes):
+        """Atomically write audio to the cache and evict old entries over the size cap"""
+        global _cache_size
+        if _TTS_CACHE_MAX_BYTES <= 0:
+            return
+        try:
+            # A unique temp file per write, as several workers may cache the same clip at once
+            with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as f:
+                f.write(audio_bytes)
+            try:
+                os.replace(f.name, path)
+            except OSError:
+                os.unlink(f.name)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not cache audio at {path}: {e}")
+            return
         
-        # Clean up multiple spaces and line breaks
-        text = re.sub(r'\n+', '. ', text)
-        text = re.sub(r'\s+', ' ', text)
+        with _cache_size_lock:
+            if _cache_size is None:
+                _cache_size = self._evict_cached_audio()
+            else:
+                _cache_size += len(audio_bytes)
+                if _cache_size > _TTS_CACHE_MAX_BYTES:
+                    _cache_size = self._evict_cached_audio()
+    
+    @staticmethod
+    def _evict_cached_audio() -> int:
+        """Delete least recently used cache files once over the size cap; returns the folder's size"""
+        entries = []
+        total_size = 0
+        for path in _AUDIO_DIR.iterdir():
+            # Include files cached under a previously configured format
+            if path.suffix[1:] not in Config.TTS_MIME_TYPES:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
         
-        # Ensure proper sentence ending
-        text = text.strip()
-        if text and not text.endswith(('.', '!', '?')):
-            text += '.'
+        if total_size <= _TTS_CACHE_MAX_BYTES:
+            return total_size
         
-        return text
+        for _, size, path in sorted(entries):
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total_size -= size
+            if total_size <= _TTS_CACHE_TRIM_BYTES:
+                break
+        return total_size
     
-    def create_audio_player(self, audio_bytes: bytes, key: str = None) -> str:
-        """
-        Create an HTML audio player with the audio data
-        
-        Args:
-            audio_bytes: Audio data in bytes
-            key: Unique key for the audio player
-            
-        Returns:
-            HTML string for the audio player
-        """
+    def clean_text_for_tts(self, text: str) -> str:
+        """Clean text for text-to-speech (see the module-level clean_text_for_tts)"""
+        return clean_text_for_tts(text)
+    
+    def render_audio_player(self, audio_bytes: bytes):
+        """Play audio through Streamlit's media endpoint instead of an inline base64 data URI"""
         if not audio_bytes:
-            return ""
-        
-        # Encode audio as base64
-        audio_base64 = base64.b64encode(audio_bytes).decode()
-        
-        # Create unique key if not provided
-        if not key:
-            key = f"audio_{int(time.time() * 1000)}"
-        
-        # HTML audio player with custom styling
-        audio_html = f"""
-        <div class="audio-player-container" style="margin: 10px 0;">
-            <div class="audio-controls" style="
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                border-radius: 25px;
-                padding: 10px 20px;
-                display: flex;
-                align-items: center;
-                gap: 15px;
-                box-shadow: 0 4px 15px rgba(102,126,234,0.3);
-            ">
-                <div style="color: white; font-weight: 500; display: flex; align-items: center; gap: 8px;">
-                    🔊 <span style="font-size: 14px;">Audio Response</span>
-                </div>
-                <audio controls style="
-                    height: 35px;
-                    border-radius: 17px;
-                    outline: none;
-                    flex: 1;
-                    min-width: 200px;
-                ">
-                    <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mpeg">
-                    Your browser does not support audio playback.
-                </audio>
-            </div>
-        </div>
-        """
-        
-        return audio_html
+            return
+        st.audio(audio_bytes, format=_AUDIO_MIME_TYPE)
     
     def test_voice(self, voice: str) -> Optional[bytes]:
         """Test a voice with a sample text"""
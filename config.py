@@ -29,13 +29,42 @@ class Config:
     
     # OpenAI Settings
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    MODEL = os.getenv("MODEL", "gpt-3.5-turbo")
+    MODEL = os.getenv("MODEL", "gpt-4o-mini")
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1500"))
+    
+    # Short questions are routed to a cheaper model with a smaller token budget
+    SHORT_QUERY_MODEL = os.getenv("SHORT_QUERY_MODEL", "gpt-4o-mini")
+    SHORT_QUERY_TOKEN_LIMIT = 50
+    SHORT_QUERY_MAX_TOKENS = int(os.getenv("SHORT_QUERY_MAX_TOKENS", "800"))
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.3"))
+    MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "20"))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+    HTTP_TIMEOUT = 60.0
+    HTTP_CONNECT_TIMEOUT = 5.0
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+    HTTP_KEEPALIVE_EXPIRY = 60.0
+    BATCH_POLL_INTERVAL = 30  # seconds between Batch API status checks
+    
+    # Response Cache Settings
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    # Off by default: a file keeps every student question and answer on disk across restarts
+    RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", "")  # e.g. cache/response_cache.pkl
     
     # Text-to-Speech Settings
     TTS_MODEL = "tts-1"
     TTS_VOICE = "alloy"
+    TTS_FORMAT = os.getenv("TTS_FORMAT", "aac")  # plays everywhere incl. Safari/iOS; opus is smaller but opt-in
+    TTS_MIME_TYPES = {
+        'opus': 'audio/ogg',
+        'mp3': 'audio/mpeg',
+        'aac': 'audio/aac',
+        'flac': 'audio/flac',
+        'wav': 'audio/wav'
+    }
+    TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "500"))  # on-disk audio cache cap, 0 disables
     SUPPORTED_VOICES = {
         'alloy': 'Alloy (Neutral)',
         'echo': 'Echo (Male)', 
@@ -47,16 +76,27 @@ class Config:
     
     # Document Processing
     MAX_CONTENT_LENGTH = 15000
+    MAX_CONTENT_TOKENS = int(os.getenv("MAX_CONTENT_TOKENS", "4000"))  # document budget per request
     PREVIEW_LENGTH = 800
+    RETRIEVAL_CHUNK_SIZE = 2000  # characters, roughly 500 tokens
     SUPPORTED_EXTENSIONS = ['.pdf', '.docx']
     
     # UI Settings
     LAYOUT = "wide"
     INITIAL_SIDEBAR_STATE = "expanded"
+    DATABASE_POLL_INTERVAL = 0.3  # seconds between checks while the database loads
+    
+    # Set once validation passes so later reruns skip the filesystem checks
+    _setup_validated = False
+    # Set once the audio and asset folders exist
+    _folders_ready = False
     
     @classmethod
     def validate_setup(cls) -> tuple[bool, list[str]]:
         """Validate that all required configurations are properly set"""
+        if cls._setup_validated:
+            return True, []
+        
         errors = []
         
         # Check API key
@@ -82,7 +122,26 @@ class Config:
                 except Exception as e:
                     errors.append(f"Could not create folder {folder}: {str(e)}")
         
-        return len(errors) == 0, errors
+        # Failures are re-checked on every call so fixes are picked up without a restart
+        cls._setup_validated = len(errors) == 0
+        # A passing check has created the optional folders too
+        cls._folders_ready = cls._folders_ready or cls._setup_validated
+        return cls._setup_validated, errors
+    
+    @classmethod
+    def invalidate_setup_cache(cls):
+        """Forget earlier checks so the next validate_setup and ensure_folders look again"""
+        cls._setup_validated = False
+        cls._folders_ready = False
+    
+    @classmethod
+    def ensure_folders(cls):
+        """Create the audio and asset folders once per process"""
+        if cls._folders_ready:
+            return
+        for folder in [cls.ASSETS_FOLDER, cls.AUDIO_FOLDER, cls.TEMP_AUDIO_FOLDER]:
+            Path(folder).mkdir(exist_ok=True)
+        cls._folders_ready = True
     
     @classmethod
     def get_env_file_template(cls) -> str:
@@ -91,9 +150,24 @@ class Config:
 OPENAI_API_KEY=your_openai_api_key_here
 
 # Optional: Model Configuration (defaults provided)
-# MODEL=gpt-3.5-turbo
+# MODEL=gpt-4o-mini
+# SHORT_QUERY_MODEL=gpt-4o-mini
 # MAX_TOKENS=1500
+# SHORT_QUERY_MAX_TOKENS=800
 # TEMPERATURE=0.3
+# MAX_CONTENT_TOKENS=4000
+
+# Optional: Response Cache Configuration
+# RESPONSE_CACHE_SIZE=10000
+# SEMANTIC_CACHE_ENABLED=true
+# SEMANTIC_CACHE_THRESHOLD=0.95
+# EMBEDDING_MODEL=text-embedding-3-small
+# Set to persist cached questions and answers to disk (off by default)
+# RESPONSE_CACHE_FILE=cache/response_cache.pkl
+
+# Optional: Text-to-Speech Configuration
+# TTS_FORMAT=aac
+# TTS_CACHE_MAX_MB=500
 """
     
     @classmethod
@@ -1,13 +1,98 @@
 # conversation_flows.py - Updated conversation flow management with proper RTL support
 
+import hashlib
+import re
 import streamlit as st
 import time
 import logging
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 from localization import t, language_manager
+from database_manager import DatabaseManager
+from document_processor import DocumentProcessor
+from session_manager import SessionManager
 
 logger = logging.getLogger(__name__)
 
+# Example questions shown for each coursework type
+_EXAMPLE_QUESTIONS: Dict[str, Tuple[str, ...]] = {
+    'assignment': (
+        "What are the key requirements for this assignment?",
+        "How should I structure my report?",
+        "What citation format should I use?",
+        "What are the assessment criteria?"
+    ),
+    'reading': (
+        "Can you summarize the main concepts in this module?",
+        "What are the key theories I should understand?",
+        "Which readings are most important for the exam?",
+        "How do these concepts relate to practical applications?"
+    ),
+    'concepts': (
+        "Can you explain [specific concept] in simple terms?",
+        "How does [theory A] relate to [theory B]?",
+        "What are some real-world examples of this concept?",
+        "Why is this concept important in the field?"
+    ),
+    'exam': (
+        "What topics are likely to be on the exam?",
+        "How should I prepare for this type of assessment?",
+        "Can you create practice questions for me?",
+        "What are the key points I should remember?"
+    ),
+    'general': (
+        "What are the learning objectives for this module?",
+        "How can I improve my understanding of this subject?",
+        "What additional resources do you recommend?",
+        "How does this module connect to my overall programme?"
+    )
+}
+
+# The example questions as one markdown list per coursework type
+_EXAMPLE_QUESTIONS_MD: Dict[str, str] = {
+    coursework_type: "\n".join(f"- \"{example}\"" for example in examples)
+    for coursework_type, examples in _EXAMPLE_QUESTIONS.items()
+}
+
+# Chat bubbles; styling lives in the .chat-bubble classes of the page CSS
+_USER_BUBBLE_HTML = '<div class="chat-bubble chat-bubble-user" {lang_attr}><strong>🙋 {label}:</strong><br>{content}</div>'
+_ASSISTANT_BUBBLE_HTML = '<div class="chat-bubble chat-bubble-assistant" {lang_attr}><strong>🤖 {label}:</strong><br>{content}</div>'
+
+# Student IDs are a letter followed by 8 digits, e.g. A00034131
+_STUDENT_ID_PATTERN = re.compile(r'[A-Z]\d{8}')
+
+# Seconds between checks while audio is generated in the background
+AUDIO_POLL_INTERVAL = 0.5
+
+# Coursework types with their title and description translation keys
+_COURSEWORK_OPTIONS: Tuple[Tuple[str, str, str], ...] = (
+    ('assignment', 'assignment_questions', 'assignment_questions_desc'),
+    ('reading', 'reading_materials', 'reading_materials_desc'),
+    ('concepts', 'concepts_theory', 'concepts_theory_desc'),
+    ('exam', 'exam_preparation', 'exam_preparation_desc'),
+    ('general', 'general_questions', 'general_questions_desc')
+)
+
+@lru_cache(maxsize=16)
+def _lang_attr(language: str) -> str:
+    """HTML lang attribute for non-English text, so the RTL styles apply"""
+    return f'lang="{language}"' if language != 'en' else ''
+
+def _session_text(key: str, **kwargs) -> str:
+    """Translate for this session's language; widget callbacks run before init_language_system"""
+    return language_manager.get_text_for_language(st.session_state.get('language', 'en'), key, **kwargs)
+
+@st.cache_resource
+def get_audio_executor() -> ThreadPoolExecutor:
+    """Process-wide workers for generating speech off the script thread"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts")
+
+@st.cache_resource
+def get_prefetch_executor() -> ThreadPoolExecutor:
+    """A single process-wide worker for speculative prefetches, kept apart from users' speech"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+
 class ConversationFlows:
     """Manages conversation flows and screen rendering with full RTL translation support"""
     
@@ -17,11 +102,12 @@ class ConversationFlows:
     
     def render_student_id_input(self):
         """Render student ID input screen with translation support"""
-        lang_attr = f'lang="{language_manager.current_language}"' if language_manager.current_language != 'en' else ''
+        lang_attr = _lang_attr(language_manager.current_language)
+        student_id_help = t('student_id_help')
         
         st.markdown(f'<div {lang_attr}>', unsafe_allow_html=True)
         st.markdown(f"### 🆔 Step 2: {t('enter_student_id')}")
-        st.markdown(f"{t('student_id_help')} **{st.session_state.selected_path}** assistance.")
+        st.markdown(f"{student_id_help} **{st.session_state.selected_path}** assistance.")
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Show error if exists
@@ -30,239 +116,243 @@ class ConversationFlows:
             if st.session_state.get('retry_count', 0) > 2:
                 st.warning("Having trouble? Please contact IT support or check your credentials.")
         
-        # Create a form to ensure proper input handling
+        # Create a form to ensure proper input handling; the callbacks run before the rerun the submit triggers
         with st.form("student_id_form"):
-            student_id = st.text_input(
+            st.text_input(
                 t('student_id_label'),
                 placeholder=t('student_id_placeholder'),
-                help=t('student_id_help'),
-                value=""
+                help=student_id_help,
+                value="",
+                key="student_id_input"
             )
             
             col1, col2 = st.columns([1, 3])
             
             with col1:
-                back_clicked = st.form_submit_button(
+                st.form_submit_button(
                     t('back_button'), 
-                    type="secondary"
+                    type="secondary",
+                    on_click=self._on_student_id_back
                 )
             
             with col2:
-                next_clicked = st.form_submit_button(
+                st.form_submit_button(
                     t('next_button'), 
-                    type="primary"
+                    type="primary",
+                    on_click=self._on_student_id_next
                 )
         
-        # Handle form submissions
-        if back_clicked:
-            st.session_state.conversation_step = 'welcome'
+    @staticmethod
+    def _on_student_id_back():
+        """Return to the welcome screen"""
+        st.session_state.conversation_step = 'welcome'
+        st.session_state.error_message = None
+        st.session_state.retry_count = 0
+    
+    @staticmethod
+    def _on_student_id_next():
+        """Accept a well-formed student ID and move on to the access code"""
+        student_id = st.session_state.get('student_id_input', '').strip().upper()
+        if not student_id:
+            st.session_state.error_message = _session_text('enter_question')
+        elif not _STUDENT_ID_PATTERN.fullmatch(student_id):
+            # Reject malformed IDs here rather than after the code has been entered
+            st.session_state.error_message = _session_text('invalid_student_id_format')
+        else:
+            st.session_state.student_id = student_id
+            st.session_state.conversation_step = 'code'
             st.session_state.error_message = None
-            st.session_state.retry_count = 0
-            st.rerun()
-        
-        if next_clicked:
-            if student_id and student_id.strip():
-                st.session_state.student_id = student_id.strip().upper()
-                st.session_state.conversation_step = 'code'
-                st.session_state.error_message = None
-                st.rerun()
-            else:
-                st.error(t('enter_question'))
     
     def render_code_input(self):
         """Render access code input screen with translation support"""
-        lang_attr = f'lang="{language_manager.current_language}"' if language_manager.current_language != 'en' else ''
+        lang_attr = _lang_attr(language_manager.current_language)
+        access_code_help = t('access_code_help')
         
         st.markdown(f'<div {lang_attr}>', unsafe_allow_html=True)
         st.markdown(f"### 🔐 Step 3: {t('enter_access_code')}")
         st.markdown(f"{t('student_id_label')} **{st.session_state.student_id}**")
-        st.markdown(t('access_code_help'))
+        st.markdown(access_code_help)
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Show error if exists
         if st.session_state.get('error_message'):
             st.error(st.session_state.error_message)
         
-        # Create a form for proper input handling
+        # Create a form for proper input handling; the callbacks run before the rerun the submit triggers
         with st.form("access_code_form"):
-            code = st.text_input(
+            st.text_input(
                 t('access_code_label'),
                 type="password",
                 placeholder=t('access_code_placeholder'),
-                help=t('access_code_help'),
-                value=""
+                help=access_code_help,
+                value="",
+                key="access_code_input"
             )
             
             col1, col2 = st.columns([1, 3])
             
             with col1:
-                back_clicked = st.form_submit_button(
+                st.form_submit_button(
                     t('back_button'), 
-                    type="secondary"
+                    type="secondary",
+                    on_click=self._on_code_back
                 )
             
             with col2:
-                verify_clicked = st.form_submit_button(
+                st.form_submit_button(
                     t('verify_button'), 
-                    type="primary"
+                    type="primary",
+                    on_click=self._on_verify_code
                 )
         
-        # Handle form submissions
-        if back_clicked:
-            st.session_state.conversation_step = 'student_id'
-            st.session_state.error_message = None
-            st.rerun()
+    @staticmethod
+    def _on_code_back():
+        """Return to the student ID screen"""
+        st.session_state.conversation_step = 'student_id'
+        st.session_state.error_message = None
+    
+    @staticmethod
+    def _on_verify_code():
+        """Validate the access code and move on to the next step, or record the error"""
+        code = st.session_state.get('access_code_input', '')
+        student_id = st.session_state.student_id
+        if not code.strip():
+            st.session_state.error_message = _session_text('enter_ethics_question')
+            return
         
-        if verify_clicked:
-            if code and code.strip():
-                # Import here to avoid circular imports
-                from database_manager import DatabaseManager
-                
-                # Validate credentials
-                is_valid, student_data, message = DatabaseManager.validate_student_credentials(
-                    st.session_state.student_id, 
-                    code
-                )
-                
-                if is_valid:
-                    st.session_state.student_code = code
-                    st.session_state.student_data = student_data
-                    st.session_state.available_modules = student_data['modules']
-                    st.session_state.error_message = None
-                    st.session_state.retry_count = 0
-                    
-                    if st.session_state.selected_path == 'ethics':
-                        st.session_state.conversation_step = 'ethics_chat'
-                    else:
-                        st.session_state.conversation_step = 'module'
-                    
-                    st.success(f"✅ {t('auth_successful')}, {st.session_state.student_id}!")
-                    time.sleep(1)
-                    st.rerun()
-                else:
-                    # Translate error message if it contains placeholders
-                    if 'not found' in message:
-                        translated_message = t('student_not_found', student_id=st.session_state.student_id)
-                    elif 'Invalid code' in message:
-                        translated_message = t('invalid_code', student_id=st.session_state.student_id)
-                    else:
-                        translated_message = message
-                    
-                    st.session_state.error_message = translated_message
-                    st.session_state.retry_count = st.session_state.get('retry_count', 0) + 1
-                    st.rerun()
+        # Validate credentials
+        is_valid, student_data, message = DatabaseManager.validate_student_credentials(
+            student_id, 
+            code
+        )
+        
+        if is_valid:
+            st.session_state.student_code = code
+            st.session_state.student_data = student_data
+            st.session_state.available_modules = student_data['modules']
+            st.session_state.error_message = None
+            st.session_state.retry_count = 0
+            
+            if st.session_state.selected_path == 'ethics':
+                st.session_state.conversation_step = 'ethics_chat'
+            else:
+                st.session_state.conversation_step = 'module'
+            
+            # A toast survives the rerun, so the welcome needs no blocking pause
+            st.toast(f"{_session_text('auth_successful')}, {student_id}!", icon="✅")
+        else:
+            # Translate error message if it contains placeholders
+            if 'not found' in message:
+                translated_message = _session_text('student_not_found', student_id=student_id)
+            elif 'Invalid code' in message:
+                translated_message = _session_text('invalid_code', student_id=student_id)
             else:
-                st.error(t('enter_ethics_question'))
+                translated_message = message
+            
+            st.session_state.error_message = translated_message
+            st.session_state.retry_count = st.session_state.get('retry_count', 0) + 1
     
     def render_module_selection(self):
         """Render module selection screen with translation support"""
-        lang_attr = f'lang="{language_manager.current_language}"' if language_manager.current_language != 'en' else ''
+        lang_attr = _lang_attr(language_manager.current_language)
+        select_module = t('select_module')
+        student_id = st.session_state.student_id
         
         st.markdown(f'<div {lang_attr}>', unsafe_allow_html=True)
-        st.markdown(f"### 📚 Step 4: {t('select_module')}")
-        st.markdown(f"{t('student_id_label')} **{st.session_state.student_id}**")
+        st.markdown(f"### 📚 Step 4: {select_module}")
+        st.markdown(f"{t('student_id_label')} **{student_id}**")
         st.markdown(f"{t('programme_label')} **{st.session_state.student_data['programme']}**")
         st.markdown(t('choose_module'))
         st.markdown('</div>', unsafe_allow_html=True)
         
-        # Import here to avoid circular imports
-        from database_manager import DatabaseManager
-        
-        # Get modules from the database
-        student_modules = DatabaseManager.get_student_modules(st.session_state.student_id)
+        # Modules are fetched together with the credentials at login
+        student_modules = st.session_state.get('available_modules')
+        if not student_modules:
+            student_modules = DatabaseManager.get_student_modules(student_id)
         
         if not student_modules:
             st.error(f"❌ {t('no_modules_found')}")
-            if st.button(t('back_to_authentication'), key="no_modules_back"):
-                st.session_state.conversation_step = 'code'
-                st.rerun()
+            st.button(t('back_to_authentication'), key="no_modules_back",
+                      on_click=SessionManager.set_step, args=('code',))
             return
         
-        # Display modules
-        for module_name, pdfs in student_modules.items():
-            st.markdown(f"**📖 {module_name}**")
+        # One module picker, one document picker and one button instead of a button per PDF
+        module_name = st.selectbox(select_module, options=list(student_modules), key="module_choice")
+        pdfs = student_modules[module_name]
             
-            if len(pdfs) > 1:
-                # Multi-PDF module
-                st.markdown(f"*({len(pdfs)} {t('documents_available')})*")
-                
-                # Individual PDF buttons
-                cols = st.columns(len(pdfs))
-                for i, pdf_data in enumerate(pdfs):
-                    with cols[i]:
-                        if st.button(
-                            f"📄 {pdf_data['coursework_type']}", 
-                            key=f"{module_name}_pdf_{i}_{pdf_data['pdf_file']}", 
-                            help=f"Select {pdf_data['display_name']}",
-                            use_container_width=True
-                        ):
-                            st.session_state.selected_module = {
-                                'module': module_name,
-                                'programme': pdf_data['programme'],
-                                'pdf_file': pdf_data['pdf_file'],
-                                'coursework_type': pdf_data['coursework_type'],
-                                'display_name': pdf_data['display_name'],
-                                'is_multi_pdf': True,
-                                'all_pdfs': pdfs
-                            }
-                            st.session_state.conversation_step = 'coursework'
-                            st.rerun()
+        if len(pdfs) > 1:
+            # Multi-PDF module; None stands for all materials together
+            all_materials = t('all_materials', module=module_name)
+            pdf_index = st.radio(
+                f"{len(pdfs)} {t('documents_available')}",
+                options=[*range(len(pdfs)), None],
+                format_func=lambda i: f"📚 {all_materials}" if i is None else f"📄 {pdfs[i]['coursework_type']}",
+                horizontal=True,
+                key=f"{module_name}_pdf_choice"
+            )
+        else:
+            pdf_index = 0
                 
-                # Select all button
-                if st.button(
-                    f"📚 {t('all_materials', module=module_name)}", 
-                    key=f"{module_name}_all_pdfs",
-                    help=f"Load all {len(pdfs)} documents together",
-                    type="secondary",
-                    use_container_width=True
-                ):
-                    st.session_state.selected_module = {
-                        'module': module_name,
-                        'programme': pdfs[0]['programme'],
-                        'pdf_file': 'multiple',
-                        'coursework_type': 'All Materials',
-                        'display_name': t('all_materials', module=module_name),
-                        'is_multi_pdf': True,
-                        'all_pdfs': pdfs
-                    }
-                    st.session_state.conversation_step = 'coursework'
-                    st.rerun()
-            
-            else:
-                # Single PDF module
-                pdf_data = pdfs[0]
-                if st.button(
-                    t('select_button', module=module_name), 
-                    key=f"{module_name}_single",
-                    help=f"Access {pdf_data['pdf_file']}",
-                    use_container_width=True,
-                    type="primary"
-                ):
-                    st.session_state.selected_module = {
-                        'module': module_name,
-                        'programme': pdf_data['programme'],
-                        'pdf_file': pdf_data['pdf_file'],
-                        'coursework_type': pdf_data.get('coursework_type', 'Course Materials'),
-                        'display_name': pdf_data.get('display_name', module_name),
-                        'is_multi_pdf': False,
-                        'all_pdfs': pdfs
-                    }
-                    st.session_state.conversation_step = 'coursework'
-                    st.rerun()
+        st.button(
+            t('select_button', module=module_name),
+            key="module_continue",
+            use_container_width=True,
+            type="primary",
+            on_click=self._on_module_selected,
+            args=(module_name, pdfs, pdf_index)
+        )
             
-            st.markdown("---")
+        st.markdown("---")
         
         # Back button
-        if st.button(t('back_to_authentication'), 
-                    type="secondary",
-                    key="module_back_btn",
-                    use_container_width=True):
-            st.session_state.conversation_step = 'code'
-            st.rerun()
+        st.button(t('back_to_authentication'), 
+                  type="secondary",
+                  key="module_back_btn",
+                  use_container_width=True,
+                  on_click=SessionManager.set_step,
+                  args=('code',))
+    
+    @staticmethod
+    def _on_module_selected(module_name: str, pdfs: list, pdf_index: Optional[int]):
+        """Store the chosen module and document(s) and move on to coursework selection"""
+        if len(pdfs) == 1:
+            # Single PDF module
+            pdf_data = pdfs[0]
+            st.session_state.selected_module = {
+                'module': module_name,
+                'programme': pdf_data['programme'],
+                'pdf_file': pdf_data['pdf_file'],
+                'coursework_type': pdf_data.get('coursework_type', 'Course Materials'),
+                'display_name': pdf_data.get('display_name', module_name),
+                'is_multi_pdf': False,
+                'all_pdfs': pdfs
+            }
+        elif pdf_index is None:
+            st.session_state.selected_module = {
+                'module': module_name,
+                'programme': pdfs[0]['programme'],
+                'pdf_file': 'multiple',
+                'coursework_type': 'All Materials',
+                'display_name': _session_text('all_materials', module=module_name),
+                'is_multi_pdf': True,
+                'all_pdfs': pdfs
+            }
+        else:
+            pdf_data = pdfs[pdf_index]
+            st.session_state.selected_module = {
+                'module': module_name,
+                'programme': pdf_data['programme'],
+                'pdf_file': pdf_data['pdf_file'],
+                'coursework_type': pdf_data['coursework_type'],
+                'display_name': pdf_data['display_name'],
+                'is_multi_pdf': True,
+                'all_pdfs': pdfs
+            }
+        st.session_state.conversation_step = 'coursework'
     
     def render_coursework_selection(self):
         """Render coursework selection screen with translation support"""
-        lang_attr = f'lang="{language_manager.current_language}"' if language_manager.current_language != 'en' else ''
+        lang_attr = _lang_attr(language_manager.current_language)
         
         st.markdown(f'<div {lang_attr}>', unsafe_allow_html=True)
         st.markdown(f"### 📋 Step 5: {t('coursework_assistance')}")
@@ -271,84 +361,74 @@ class ConversationFlows:
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Coursework options with translations
-        coursework_options = [
-            {
-                'title': t('assignment_questions'),
-                'description': t('assignment_questions_desc'),
-                'type': 'assignment'
-            },
-            {
-                'title': t('reading_materials'),
-                'description': t('reading_materials_desc'),
-                'type': 'reading'
-            },
-            {
-                'title': t('concepts_theory'),
-                'description': t('concepts_theory_desc'),
-                'type': 'concepts'
-            },
-            {
-                'title': t('exam_preparation'),
-                'description': t('exam_preparation_desc'),
-                'type': 'exam'
-            },
-            {
-                'title': t('general_questions'),
-                'description': t('general_questions_desc'),
-                'type': 'general'
-            }
-        ]
-        
-        for option in coursework_options:
-            if st.button(
-                f"📝 {option['title']}", 
-                help=option['description'],
+        for coursework_type, title_key, description_key in _COURSEWORK_OPTIONS:
+            title = t(title_key)
+            description = t(description_key)
+            st.button(
+                f"📝 {title}", 
+                help=description,
                 use_container_width=True,
-                key=f"coursework_{option['type']}"
-            ):
-                st.session_state.selected_coursework = option
-                st.session_state.conversation_step = 'chat'
-                st.rerun()
+                key=f"coursework_{coursework_type}",
+                on_click=self._on_coursework_selected,
+                args=(coursework_type, title, description)
+            )
         
         # Back button
-        if st.button(t('back_to_modules'), type="secondary", key="coursework_back"):
-            st.session_state.conversation_step = 'module'
-            st.rerun()
+        st.button(t('back_to_modules'), type="secondary", key="coursework_back",
+                  on_click=SessionManager.set_step, args=('module',))
+    
+    @staticmethod
+    def _on_coursework_selected(coursework_type: str, title: str, description: str):
+        """Store the chosen coursework type and open the chat"""
+        st.session_state.selected_coursework = {
+            'title': title,
+            'description': description,
+            'type': coursework_type
+        }
+        st.session_state.conversation_step = 'chat'
     
     def render_chat_interface(self):
         """Render the chat interface for coursework with proper RTL translation support"""
-        # Import here to avoid circular imports
-        from document_processor import DocumentProcessor
-        from session_manager import SessionManager
+        session = st.session_state
+        selected_module = session.get('selected_module')
         
         # Load document if not already loaded
-        if not st.session_state.get('current_document') and st.session_state.get('selected_module'):
+        if not session.get('current_document') and selected_module:
             with st.spinner(t('loading_materials')):
-                content, metadata, message = DocumentProcessor.load_document_for_module(st.session_state.selected_module)
+                content, metadata, message = DocumentProcessor.load_document_for_module(selected_module)
                 if content:
-                    st.session_state.current_document = {
+                    session.current_document = {
                         'content': content,
                         'metadata': metadata,
-                        'module': st.session_state.selected_module
+                        'module': selected_module
                     }
+                    session.prefetched_responses = {}
                     st.success(message)
                 else:
                     st.error(message)
                     return
         
         # Header with translations and RTL support
-        current_language = getattr(st.session_state, 'language', 'en')
-        lang_attr = f'lang="{current_language}"' if current_language != 'en' else ''
+        lang_attr = _lang_attr(getattr(session, 'language', 'en'))
         
         st.markdown(f'<div {lang_attr}>', unsafe_allow_html=True)
-        st.markdown(f"### 📚 {st.session_state.selected_module['module']}")
-        st.markdown(f"**Coursework Type:** {st.session_state.selected_coursework['title']}")
-        st.markdown(f"**{t('programme_label')}** {st.session_state.student_data['programme']}")
+        st.markdown(f"### 📚 {selected_module['module']}")
+        st.markdown(f"**Coursework Type:** {session.selected_coursework['title']}")
+        st.markdown(f"**{t('programme_label')}** {session.student_data['programme']}")
         st.markdown('</div>', unsafe_allow_html=True)
         
         # Example questions
         self._render_example_questions()
         
+        # Answer the likeliest first question while the user reads the examples
+        self._prefetch_example_response()
+        
+        # Messages, input and controls rerun on their own when chatting
+        self._render_chat_fragment()
+    
+    @st.fragment
+    def _render_chat_fragment(self):
+        """Render the chat body; a new message reruns only this fragment, not the whole app"""
         # Chat messages with RTL support
         self._render_chat_messages_with_rtl()
         
@@ -362,115 +442,185 @@ class ConversationFlows:
         """Render example questions based on coursework type with translation support"""
         with st.expander(f"💡 {t('example_questions')}", expanded=False):
             coursework_type = st.session_state.selected_coursework['type']
-            examples = {
-                'assignment': [
-                    "What are the key requirements for this assignment?",
-                    "How should I structure my report?",
-                    "What citation format should I use?",
-                    "What are the assessment criteria?"
-                ],
-                'reading': [
-                    "Can you summarize the main concepts in this module?",
-                    "What are the key theories I should understand?",
-                    "Which readings are most important for the exam?",
-                    "How do these concepts relate to practical applications?"
-                ],
-                'concepts': [
-                    "Can you explain [specific concept] in simple terms?",
-                    "How does [theory A] relate to [theory B]?",
-                    "What are some real-world examples of this concept?",
-                    "Why is this concept important in the field?"
-                ],
-                'exam': [
-                    "What topics are likely to be on the exam?",
-                    "How should I prepare for this type of assessment?",
-                    "Can you create practice questions for me?",
-                    "What are the key points I should remember?"
-                ],
-                'general': [
-                    "What are the learning objectives for this module?",
-                    "How can I improve my understanding of this subject?",
-                    "What additional resources do you recommend?",
-                    "How does this module connect to my overall programme?"
-                ]
-            }
-            
-            for example in examples.get(coursework_type, examples['general']):
-                st.markdown(f"- \"{example}\"")
+            st.markdown(_EXAMPLE_QUESTIONS_MD.get(coursework_type, _EXAMPLE_QUESTIONS_MD['general']))
+    
+    @staticmethod
+    def _prefetch_example(coursework_type: str) -> Tuple[int, str]:
+        """Pick the first example question that can be asked as written, without placeholders"""
+        examples = _EXAMPLE_QUESTIONS.get(coursework_type, _EXAMPLE_QUESTIONS['general'])
+        return next(((i, q) for i, q in enumerate(examples) if '[' not in q), (0, examples[0]))
+    
+    def _prefetch_example_response(self):
+        """Speculatively answer an example question, and voice the answer, in the background"""
+        session = st.session_state
+        if session.get('messages') or not self.ai_assistant.is_available():
+            return
+        
+        coursework_type = session.selected_coursework['type']
+        language = session.get('language', 'en')
+        example_idx, question = self._prefetch_example(coursework_type)
+        prefetch_key = (coursework_type, example_idx, language)
+        prefetched_responses = session.prefetched_responses
+        if prefetch_key in prefetched_responses:
+            return
+        
+        voice = session.get('selected_voice', 'alloy') if session.get('audio_enabled', True) else None
+        document = session.current_document
+        prefetched_responses[prefetch_key] = get_prefetch_executor().submit(
+            self._prefetch_task,
+            question,
+            document['content'],
+            document['module'],
+            language,
+            voice
+        )
+    
+    def _prefetch_task(self, question: str, document_content: str, module_info: Dict,
+                       language: str, voice: Optional[str]) -> str:
+        """Generate an answer and queue warming the speech cache for it; runs on the prefetch executor"""
+        response = self.ai_assistant.generate_coursework_response(
+            question, document_content, module_info, language=language
+        )
+        if voice and response and self.audio_manager and self.audio_manager.is_available():
+            # Queued rather than run here, so taking the answer never waits for its speech
+            get_prefetch_executor().submit(self.audio_manager.generate_audio_response, response, voice)
+        return response
+    
+    def _take_prefetched_response(self, prompt: str) -> Optional[str]:
+        """Return the prefetched answer if the prompt is the prefetched example, waiting for it if in flight"""
+        coursework_type = st.session_state.selected_coursework['type']
+        example_idx, question = self._prefetch_example(coursework_type)
+        if prompt.strip().strip('"').lower() != question.lower():
+            return None
+        
+        prefetch_key = (coursework_type, example_idx, st.session_state.get('language', 'en'))
+        prefetched_responses = st.session_state.prefetched_responses
+        future = prefetched_responses.get(prefetch_key)
+        if future is None:
+            return None
+        
+        # Serve it once; a repeat of the question goes through the normal path
+        del prefetched_responses[prefetch_key]
+        try:
+            if future.done():
+                return future.result() or None
+            # Already being answered, so wait rather than send a duplicate request
+            with st.spinner(t('preparing_answer')):
+                return future.result() or None
+        except Exception as e:
+            logger.warning(f"Prefetched response failed: {e}")
+            return None
     
     def _render_chat_messages_with_rtl(self):
         """Render chat messages with audio support and proper RTL translation"""
-        current_language = getattr(st.session_state, 'language', 'en')
-        lang_attr = f'lang="{current_language}"' if current_language != 'en' else ''
+        lang_attr = _lang_attr(getattr(st.session_state, 'language', 'en'))
         
-        for i, message in enumerate(st.session_state.get('messages', [])):
-            message_key = f"msg_{i}_{message.get('timestamp', time.time())}"
-            
+        user_label = t('you')
+        assistant_title = t('course_assistant')
+        
+        # Read session state once rather than per message
+        session = st.session_state
+        audio_enabled = session.get('audio_enabled', True)
+        voice = session.get('selected_voice', 'alloy')
+        audio_responses = session.setdefault('audio_responses', {})
+        audio_futures = session.setdefault('audio_futures', {})
+        
+        # Consecutive bubbles are sent as one markdown element, split only where an audio player goes
+        pending_html = []
+        for message in session.get('messages', []):
             if message["role"] == "user":
-                st.markdown(f"""
-                <div style="background: #e3f2fd; color: #000; padding: 1rem; border-radius: 10px; margin: 1rem 0; border-left: 4px solid #2196f3;" {lang_attr}>
-                    <strong>🙋 {t('you')}:</strong><br>{message["content"]}
-                </div>
-                """, unsafe_allow_html=True)
+                pending_html.append(_USER_BUBBLE_HTML.format(
+                    lang_attr=lang_attr, label=user_label, content=message["content"]
+                ))
             else:
-                assistant_title = t('course_assistant')
-                st.markdown(f"""
-                <div style="background: #f1f8e9; color: #000; padding: 1rem; border-radius: 10px; margin: 1rem 0; border-left: 4px solid #4caf50;" {lang_attr}>
-                    <strong>🤖 {assistant_title}:</strong><br>{message["content"]}
-                </div>
-                """, unsafe_allow_html=True)
+                pending_html.append(_ASSISTANT_BUBBLE_HTML.format(
+                    lang_attr=lang_attr, label=assistant_title, content=message["content"]
+                ))
                 
                 # Add audio player if audio is enabled
-                if st.session_state.get('audio_enabled', True):
-                    self._handle_audio_for_message(message, message_key)
+                if audio_enabled:
+                    st.markdown("\n".join(pending_html), unsafe_allow_html=True)
+                    pending_html.clear()
+                    self._handle_audio_for_message(message, voice, audio_responses, audio_futures)
+        
+        if pending_html:
+            st.markdown("\n".join(pending_html), unsafe_allow_html=True)
+    
+    @staticmethod
+    def _audio_key(content: str, voice: str) -> str:
+        """Key audio by message text and voice so identical answers share one clip"""
+        return f"{hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()}_{voice}"
     
-    def _handle_audio_for_message(self, message: Dict[str, Any], message_key: str):
+    def _handle_audio_for_message(self, message: Dict[str, Any], voice: str,
+                                  audio_responses: Dict[str, bytes], audio_futures: Dict[str, Any]):
         """Handle audio generation and display for a message"""
+        message_key = self._audio_key(message["content"], voice)
+        
         # Check if we already have audio for this message
-        if message_key not in st.session_state.get('audio_responses', {}):
-            # Generate audio for this message
-            if self.audio_manager and self.audio_manager.is_available():
-                with st.spinner(t('generating_audio')):
-                    audio_bytes = self.audio_manager.generate_audio_response(
-                        message["content"], 
-                        st.session_state.get('selected_voice', 'alloy')
-                    )
+        if message_key not in audio_responses:
+            future = audio_futures.get(message_key)
+            if future is None:
+                # Generate audio for this message in the background
+                self._submit_audio(message["content"], message_key, voice)
+            elif future.done():
+                del audio_futures[message_key]
+                try:
+                    audio_bytes = future.result()
                     if audio_bytes:
-                        if 'audio_responses' not in st.session_state:
-                            st.session_state.audio_responses = {}
-                        st.session_state.audio_responses[message_key] = audio_bytes
+                        audio_responses[message_key] = audio_bytes
+                except Exception as e:
+                    logger.error(f"Error generating audio: {e}")
         
         # Display audio player if we have audio
-        if message_key in st.session_state.get('audio_responses', {}):
-            audio_html = self.audio_manager.create_audio_player(
-                st.session_state.audio_responses[message_key], 
-                key=message_key
-            )
-            st.markdown(audio_html, unsafe_allow_html=True)
+        if message_key in audio_responses:
+            self.audio_manager.render_audio_player(audio_responses[message_key])
+        elif message_key in audio_futures:
+            self._render_pending_audio(message_key)
+    
+    @st.fragment(run_every=AUDIO_POLL_INTERVAL)
+    def _render_pending_audio(self, message_key: str):
+        """Show progress for a clip that is still being generated, checking back on a timer"""
+        future = st.session_state.audio_futures.get(message_key)
+        if future is None or future.done():
+            # One full rerun draws the player and stops this fragment's timer
+            st.rerun()
+        st.caption(f"⏳ {t('generating_audio')}")
+    
+    def _submit_audio(self, content: str, message_key: str, voice: str):
+        """Start generating audio for a message without blocking the script"""
+        if not (self.audio_manager and self.audio_manager.is_available()):
+            return
+        st.session_state.audio_futures[message_key] = get_audio_executor().submit(
+            self.audio_manager.generate_audio_response, content, voice
+        )
     
     def _handle_chat_input(self):
         """Handle chat input and response generation with translation support"""
         placeholder_text = t('chat_placeholder')
         
         if prompt := st.chat_input(placeholder_text):
-            # Initialize messages if not exists
-            if 'messages' not in st.session_state:
-                st.session_state.messages = []
+            session = st.session_state
+            messages = session.setdefault('messages', [])
+            document = session.current_document
             
             # Add user message
-            st.session_state.messages.append({
+            messages.append({
                 "role": "user",
                 "content": prompt,
                 "timestamp": time.time()
             })
             
-            # Generate AI response
-            with st.spinner(t('analyzing_materials')):
-                response = self.ai_assistant.generate_coursework_response(
-                    prompt,
-                    st.session_state.current_document['content'],
-                    st.session_state.current_document['module']
-                )
+            # Use the prefetched answer if ready, otherwise stream the AI response as it is generated
+            response = self._take_prefetched_response(prompt)
+            if response is None:
+                with st.chat_message("assistant", avatar="🤖"):
+                    response = st.write_stream(self.ai_assistant.generate_coursework_response_stream(
+                        prompt,
+                        document['content'],
+                        document['module'],
+                        language=session.get('language', 'en')
+                    ))
+            response = response.strip()
             
             # Add AI response
             ai_message = {
@@ -478,30 +628,20 @@ class ConversationFlows:
                 "content": response,
                 "timestamp": time.time()
             }
-            st.session_state.messages.append(ai_message)
+            messages.append(ai_message)
             
-            # Pre-generate audio if enabled
-            if st.session_state.get('audio_enabled', True) and response and self.audio_manager and self.audio_manager.is_available():
-                message_key = f"msg_{len(st.session_state.messages)-1}_{ai_message['timestamp']}"
-                try:
-                    with st.spinner(t('generating_audio')):
-                        audio_bytes = self.audio_manager.generate_audio_response(
-                            response, 
-                            st.session_state.get('selected_voice', 'alloy')
-                        )
-                        if audio_bytes:
-                            if 'audio_responses' not in st.session_state:
-                                st.session_state.audio_responses = {}
-                            st.session_state.audio_responses[message_key] = audio_bytes
-                except Exception as e:
-                    logger.error(f"Error pre-generating audio: {e}")
+            # Start generating audio in the background so the text shows right away
+            if session.get('audio_enabled', True) and response:
+                voice = session.get('selected_voice', 'alloy')
+                message_key = self._audio_key(response, voice)
+                if message_key not in session.audio_responses:
+                    self._submit_audio(response, message_key, voice)
             
-            st.rerun()
+            # Redraw the history with the new messages; the rest of the page is unchanged
+            st.rerun(scope="fragment")
     
     def _render_chat_controls(self):
         """Render chat control buttons with translation support"""
-        from session_manager import SessionManager
-        
         col1, col2, col3 = st.columns([1, 1, 2])
         
         with col1:
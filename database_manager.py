@@ -13,8 +13,25 @@ class DatabaseManager:
     """Manages student database operations"""
     
     @staticmethod
-    @st.cache_data(show_spinner=False)
+    def _database_mtime() -> float:
+        """Get the student data file's modification time, used to invalidate cached loads"""
+        try:
+            return Path(Config.STUDENT_DATA_FILE).stat().st_mtime
+        except OSError:
+            return 0.0
+    
+    @staticmethod
     def load_student_database() -> Tuple[Optional[Dict], str]:
+        """Load student database, shared across sessions until the Excel file changes"""
+        database, message = DatabaseManager._load_student_database(DatabaseManager._database_mtime())
+        if not database:
+            # Don't keep failed loads cached so a retry can succeed
+            DatabaseManager._load_student_database.clear()
+        return database, message
+    
+    @staticmethod
+    @st.cache_resource(show_spinner=False)
+    def _load_student_database(mtime: float) -> Tuple[Optional[Dict], str]:
         """Load student database from Excel file with support for multiple PDFs per module"""
         try:
             excel_path = Path(Config.STUDENT_DATA_FILE)
@@ -135,12 +152,22 @@ class DatabaseManager:
         if not st.session_state.student_database:
             return {'students': 0, 'programmes': 0, 'modules': 0}
         
-        total_students = len(st.session_state.student_database['students'])
-        total_programmes = len(st.session_state.student_database['programme_modules'])
+        return DatabaseManager._compute_database_stats(DatabaseManager._database_mtime())
+    
+    @staticmethod
+    @st.cache_data(show_spinner=False, ttl=60)
+    def _compute_database_stats(mtime: float) -> Dict[str, Any]:
+        """Compute database statistics once per version of the Excel file"""
+        database, _ = DatabaseManager._load_student_database(mtime)
+        if not database:
+            return {'students': 0, 'programmes': 0, 'modules': 0}
+        
+        total_students = len(database['students'])
+        total_programmes = len(database['programme_modules'])
         
         # Count total unique modules
         all_modules = set()
-        for programme_modules in st.session_state.student_database['programme_modules'].values():
+        for programme_modules in database['programme_modules'].values():
             all_modules.update(programme_modules.keys())
         
         return {
@@ -1,20 +1,40 @@
 # document_processor.py - Document reading and processing
 
 import logging
+import math
+import re
+from collections import Counter
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any
+from typing import Callable, Tuple, Optional, Dict, Any, List
+import streamlit as st
 from PyPDF2 import PdfReader
 from docx import Document
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Word tokens for lexical retrieval (Unicode-aware, so Arabic/French text works too)
+_TOKEN_PATTERN = re.compile(r'\w+')
+
 class DocumentProcessor:
     """Handles document reading and processing operations"""
     
     @staticmethod
     def read_document(file_path: Path) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Read PDF or DOCX document, shared across sessions until the file changes"""
+        try:
+            mtime = file_path.stat().st_mtime
+        except OSError:
+            mtime = 0.0
+        content, metadata = DocumentProcessor._read_document(str(file_path), mtime)
+        # Copy so callers can't mutate the cached metadata
+        return content, dict(metadata)
+    
+    @staticmethod
+    @st.cache_resource(show_spinner=False, max_entries=64)
+    def _read_document(path: str, mtime: float) -> Tuple[Optional[str], Dict[str, Any]]:
         """Read PDF or DOCX document"""
+        file_path = Path(path)
         try:
             if file_path.suffix.lower() == '.pdf':
                 return DocumentProcessor._read_pdf(file_path)
@@ -194,3 +214,100 @@ class DocumentProcessor:
             preview = content[:break_point + 1]
         
         return preview + "..." if len(content) > len(preview) else preview
+
+    @staticmethod
+    def chunk_text(content: str, chunk_size: int = None) -> List[str]:
+        """Split content into chunks of at most chunk_size characters on line boundaries"""
+        chunk_size = chunk_size or Config.RETRIEVAL_CHUNK_SIZE
+        chunks = []
+        current = []
+        current_length = 0
+        
+        for line in content.splitlines():
+            # Hard-split lines that are longer than a whole chunk
+            while len(line) > chunk_size:
+                if current:
+                    chunks.append("\n".join(current))
+                    current, current_length = [], 0
+                chunks.append(line[:chunk_size])
+                line = line[chunk_size:]
+            
+            if current and current_length + len(line) + 1 > chunk_size:
+                chunks.append("\n".join(current))
+                current, current_length = [], 0
+            
+            current.append(line)
+            current_length += len(line) + 1
+        
+        if current:
+            chunks.append("\n".join(current))
+        
+        return [chunk for chunk in chunks if chunk.strip()]
+
+
+class DocumentIndex:
+    """Lightweight BM25 index over chunks of a document for query-relevant context selection"""
+    
+    def __init__(self, content: str, chunk_size: int = None, k1: float = 1.5, b: float = 0.75,
+                 length_fn: Callable[[str], int] = len):
+        self.chunks = DocumentProcessor.chunk_text(content, chunk_size)
+        # Size of each chunk in the unit used for selection budgets (characters or tokens)
+        self.chunk_lengths = [length_fn(chunk) for chunk in self.chunks]
+        self.k1 = k1
+        self.b = b
+        
+        self._term_freqs = [Counter(self._tokenize(chunk)) for chunk in self.chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        
+        doc_freqs = Counter()
+        for freqs in self._term_freqs:
+            doc_freqs.update(freqs.keys())
+        total = len(self.chunks)
+        self._idf = {
+            term: math.log((total - freq + 0.5) / (freq + 0.5) + 1)
+            for term, freq in doc_freqs.items()
+        }
+    
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        """Lowercase word tokens"""
+        return _TOKEN_PATTERN.findall(text.lower())
+    
+    def score(self, query: str) -> List[float]:
+        """BM25 score of every chunk for the query"""
+        terms = [term for term in set(self._tokenize(query)) if term in self._idf]
+        scores = []
+        for freqs, length in zip(self._term_freqs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                freq = freqs.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+    
+    def select(self, query: str, max_length: int) -> str:
+        """
+        Select the most relevant chunks for a query within a length budget
+        
+        Chunks are ranked by BM25 score and returned in document order. When no
+        chunk matches the query, the start of the document is used instead.
+        """
+        scores = self.score(query)
+        if any(scores):
+            ranked = sorted(range(len(self.chunks)), key=lambda i: scores[i], reverse=True)
+        else:
+            ranked = range(len(self.chunks))
+        
+        selected = []
+        total_length = 0
+        for index in ranked:
+            chunk_length = self.chunk_lengths[index]
+            if total_length + chunk_length > max_length:
+                continue
+            selected.append(index)
+            total_length += chunk_length
+        
+        return "\n\n[...]\n\n".join(self.chunks[index] for index in sorted(selected))
@@ -1,45 +1,46 @@
 # ethics_handler.py - Direct access ethics interface with multi-language support
 
 import streamlit as st
+import hashlib
 import os
 import time
 import logging
 from pathlib import Path
 from typing import Optional, Tuple, Dict, Any
-from openai import OpenAI
 import traceback
 
 # Import from your existing modules
 from localization import t, language_manager
+from ai_assistant import get_assistant
+from config import Config
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-else:
-    client = None
-
 class EthicsConfig:
     """Configuration for ethics document handling"""
     ETHICS_PDF_FILE = "reforming_modernity.pdf"
     DATA_FOLDER = "data"
-    MAX_TOKENS = 1500
-    TEMPERATURE = 0.3
-    MODEL = "gpt-3.5-turbo"
+    MAX_TOKENS = Config.MAX_TOKENS
+    TEMPERATURE = Config.TEMPERATURE
+    MODEL = Config.MODEL
     MAX_CONTENT_LENGTH = 15000
 
+# Last ethics document and its truncated form: (source content, truncated content)
+_truncated_document: Tuple[Optional[str], str] = (None, "")
+
+def truncate_ethics_document(document_content: str) -> str:
+    """Truncate the ethics document once and reuse the slice while the content is unchanged"""
+    global _truncated_document
+    source, truncated = _truncated_document
+    if source is not document_content:
+        truncated = document_content[:EthicsConfig.MAX_CONTENT_LENGTH]
+        _truncated_document = (document_content, truncated)
+    return truncated
+
 def get_language_name(lang_code: str) -> str:
     """Get full language name for the AI prompt"""
-    language_names = {
-        'en': 'English',
-        'ar': 'Arabic',
-        'fr': 'French',
-        'es': 'Spanish'
-    }
-    return language_names.get(lang_code, 'English')
+    return language_manager.get_language_name(lang_code)
 
 def get_language_specific_instructions(language_code: str, language_name: str) -> str:
     """Get language-specific instructions for the ethics AI"""
@@ -127,6 +128,8 @@ def generate_ethics_response(question: str, document_content: str) -> str:
     try:
         logger.info("Starting ethics response generation")
         
+        # Reuse the shared assistant's OpenAI client rather than a second module-level one
+        client = get_assistant().client
         if not client:
             return t('api_key_missing')
         
@@ -143,7 +146,7 @@ def generate_ethics_response(question: str, document_content: str) -> str:
         logger.info(f"Language: {current_language}")
         
         # Truncate content if too long
-        truncated_content = document_content[:EthicsConfig.MAX_CONTENT_LENGTH]
+        truncated_content = truncate_ethics_document(document_content)
         
         # Language-specific instructions
         language_instructions = get_language_specific_instructions(current_language, language_name)
@@ -283,30 +286,39 @@ def render_ethics_chat_interface():
         if 'ethics_audio_responses' not in st.session_state:
             st.session_state.ethics_audio_responses = {}
         
+        # Read session state once rather than per message
+        audio_enabled = st.session_state.get('audio_enabled', True)
+        voice = st.session_state.get('selected_voice', 'alloy')
+        ethics_audio_responses = st.session_state.ethics_audio_responses
+        you_label = t('you')
+        advisor_label = t('ethics_advisor')
+        
         # Chat messages display with translation support
         for i, message in enumerate(st.session_state.ethics_messages):
             if not isinstance(message, dict):
                 logger.warning(f"Invalid message format at index {i}: {message}")
                 continue
                 
-            message_key = f"ethics_msg_{i}_{message.get('timestamp', time.time())}"
-            
             if message.get("role") == "user":
                 st.markdown(f"""
                 <div style="background: #e8f4fd; color: #000; padding: 1rem; border-radius: 10px; margin: 1rem 0; border-left: 4px solid #1976d2;" {lang_attr}>
-                    <strong>🙋 {t('you')}:</strong><br>{message.get('content', '')}
+                    <strong>🙋 {you_label}:</strong><br>{message.get('content', '')}
                 </div>
                 """, unsafe_allow_html=True)
             elif message.get("role") == "assistant":
                 st.markdown(f"""
                 <div style="background: #f3e5f5; color: #000; padding: 1rem; border-radius: 10px; margin: 1rem 0; border-left: 4px solid #7b1fa2;" {lang_attr}>
-                    <strong>📋 {t('ethics_advisor')}:</strong><br>{message.get('content', '')}
+                    <strong>📋 {advisor_label}:</strong><br>{message.get('content', '')}
                 </div>
                 """, unsafe_allow_html=True)
                 
                 # Add audio support if enabled
-                if st.session_state.get('audio_enabled', True):
-                    if message_key not in st.session_state.ethics_audio_responses:
+                if audio_enabled:
+                    # Key audio by voice and text so it survives message order changes and reruns
+                    message_key = hashlib.blake2b(
+                        f"{voice}|{message.get('content', '')}".encode('utf-8'), digest_size=12
+                    ).hexdigest()
+                    if message_key not in ethics_audio_responses:
                         try:
                             from audio_manager import AudioManager
                             audio_manager = AudioManager()
@@ -314,23 +326,20 @@ def render_ethics_chat_interface():
                                 with st.spinner(t('generating_audio')):
                                     audio_bytes = audio_manager.generate_audio_response(
                                         message.get('content', ''), 
-                                        st.session_state.get('selected_voice', 'alloy')
+                                        voice
                                     )
                                     if audio_bytes:
-                                        st.session_state.ethics_audio_responses[message_key] = audio_bytes
+                                        ethics_audio_responses[message_key] = audio_bytes
                         except Exception as e:
                             logger.error(f"Error generating audio: {e}")
                     
                     # Display audio player if available
-                    if message_key in st.session_state.ethics_audio_responses:
+                    if message_key in ethics_audio_responses:
                         try:
                             from audio_manager import AudioManager
-                            audio_manager = AudioManager()
-                            audio_html = audio_manager.create_audio_player(
-                                st.session_state.ethics_audio_responses[message_key], 
-                                key=message_key
+                            AudioManager().render_audio_player(
+                                ethics_audio_responses[message_key]
                             )
-                            st.markdown(audio_html, unsafe_allow_html=True)
                         except Exception as e:
                             logger.error(f"Error displaying audio player: {e}")
         
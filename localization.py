@@ -1,6 +1,7 @@
 # localization.py - Enhanced Language Management System for University Chatbot
 
 import json
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from pathlib import Path
 import streamlit as st
@@ -8,6 +9,14 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# English names of the supported languages, for telling the AI which language to answer in
+LANGUAGE_NAMES = {
+    'en': 'English',
+    'ar': 'Arabic',
+    'fr': 'French',
+    'es': 'Spanish'
+}
+
 class LanguageManager:
     """Enhanced language management system for University Chatbot"""
     
@@ -40,6 +49,13 @@ class LanguageManager:
                     except Exception as e:
                         logger.error(f"Error loading {lang_code}.json: {e}")
     
+        self.clear_translation_cache()
+    
+    def clear_translation_cache(self):
+        """Discard memoized translations, e.g. after the translation tables change"""
+        self._resolve_text.cache_clear()
+        self._format_text.cache_clear()
+    
     def set_language(self, lang_code: str):
         """Set current language and update session state"""
         if lang_code in self.translations:
@@ -50,28 +66,50 @@ class LanguageManager:
     
     def get_text(self, key: str, default: str = None, **kwargs) -> str:
         """Get translated text with parameter substitution"""
+        return self.get_text_for_language(self.current_language, key, default, **kwargs)
+    
+    def get_text_for_language(self, language: str, key: str, default: str = None, **kwargs) -> str:
+        """Get translated text for an explicit language rather than the current one"""
+        if not kwargs:
+            return self._resolve_text(language, key, default)
+        
+        # Parameter substitution, memoized when the parameters are hashable
+        try:
+            return self._format_text(language, key, default, tuple(sorted(kwargs.items())))
+        except TypeError:
+            return self._substitute(self._resolve_text(language, key, default), kwargs)
+        
+    @staticmethod
+    def _substitute(text: str, params: Dict[str, Any]) -> str:
+        """Fill in parameters, leaving the text unchanged if they don't fit"""
+        try:
+            return text.format(**params)
+        except (KeyError, ValueError):
+            return text  # Ignore formatting errors
+    
+    @lru_cache(maxsize=2048)
+    def _format_text(self, language: str, key: str, default: Optional[str], params: tuple) -> str:
+        """Resolve and fill in a parameterised text, memoized per language and parameters"""
+        return self._substitute(self._resolve_text(language, key, default), dict(params))
+    
+    @lru_cache(maxsize=4096)
+    def _resolve_text(self, language: str, key: str, default: Optional[str]) -> str:
+        """Resolve the unformatted text for a key, memoized per language"""
         # Get translation from current language
-        text = self.translations.get(self.current_language, {}).get(key)
+        text = self.translations.get(language, {}).get(key)
         
         # Fallback to default parameter if provided
         if text is None and default is not None:
             text = default
         
         # Fallback to English if translation missing
-        if text is None and self.current_language != 'en':
+        if text is None and language != 'en':
             text = self.translations.get('en', {}).get(key, key)
         
         # Final fallback to key itself
         if text is None:
             text = key
         
-        # Parameter substitution
-        if kwargs:
-            try:
-                text = text.format(**kwargs)
-            except (KeyError, ValueError):
-                pass  # Ignore formatting errors
-        
         return text
     
     def is_rtl(self) -> bool:
@@ -87,6 +125,10 @@ class LanguageManager:
             'es': '🇪🇸 Español'
         }
     
+    def get_language_name(self, lang_code: str) -> str:
+        """Get the English name of a language, as used in AI prompts"""
+        return LANGUAGE_NAMES.get(lang_code, 'English')
+    
     def _get_english_translations(self) -> Dict[str, str]:
         """English translations (base language)"""
         return {
@@ -150,6 +192,7 @@ class LanguageManager:
             'ethics_placeholder': 'Ask me about ethics based on the Reforming Modernity document...',
             'analyzing_materials': 'Analyzing your coursework materials...',
             'consulting_ethics': 'Consulting ethics guidance...',
+            'preparing_answer': 'Preparing your answer...',
             
             # Audio
             'enable_audio': 'Enable Audio Responses',
@@ -179,6 +222,7 @@ class LanguageManager:
             'enter_ethics_question': 'Please enter a question.',
             'no_modules_found': 'No modules found for your account. Please contact support.',
             'student_not_found': 'Student ID \'{student_id}\' not found in database',
+            'invalid_student_id_format': 'Invalid Student ID format (expected a letter followed by 8 digits, e.g. A00034131)',
             'invalid_code': 'Invalid code for student {student_id}',
             'auth_successful': 'Authentication successful',
             'auth_required': 'Student authentication required',
@@ -287,6 +331,7 @@ class LanguageManager:
             'ethics_placeholder': 'اسألني عن الأخلاق بناءً على وثيقة إصلاح الحداثة...',
             'analyzing_materials': 'جارٍ تحليل مواد واجباتك الدراسية...',
             'consulting_ethics': 'جارٍ استشارة التوجيه الأخلاقي...',
+            'preparing_answer': 'جارٍ إعداد إجابتك...',
             
             # Audio
             'enable_audio': 'تفعيل الاستجابات الصوتية',
@@ -316,6 +361,7 @@ class LanguageManager:
             'enter_ethics_question': 'يرجى إدخال سؤال.',
             'no_modules_found': 'لم يتم العثور على وحدات لحسابك. يرجى الاتصال بالدعم.',
             'student_not_found': 'رقم الطالب \'{student_id}\' غير موجود في قاعدة البيانات',
+            'invalid_student_id_format': 'صيغة رقم الطالب غير صحيحة (يجب أن يكون حرفاً متبوعاً بـ 8 أرقام، مثال: A00034131)',
             'invalid_code': 'رمز غير صحيح للطالب {student_id}',
             'auth_successful': 'المصادقة ناجحة',
             'auth_required': 'مصادقة الطالب مطلوبة',
@@ -424,6 +470,7 @@ class LanguageManager:
             'ethics_placeholder': 'Posez-moi des questions sur l\'éthique basées sur le document Reforming Modernity...',
             'analyzing_materials': 'Analyse de vos matériaux de devoirs...',
             'consulting_ethics': 'Consultation des conseils éthiques...',
+            'preparing_answer': 'Préparation de votre réponse...',
             
             # Audio
             'enable_audio': 'Activer les Réponses Audio',
@@ -453,6 +500,7 @@ class LanguageManager:
             'enter_ethics_question': 'Veuillez entrer une question.',
             'no_modules_found': 'Aucun module trouvé pour votre compte. Veuillez contacter le support.',
             'student_not_found': 'ID étudiant \'{student_id}\' non trouvé dans la base de données',
+            'invalid_student_id_format': 'Format d\'ID étudiant invalide (une lettre suivie de 8 chiffres attendue, ex: A00034131)',
             'invalid_code': 'Code invalide pour l\'étudiant {student_id}',
             'auth_successful': 'Authentification réussie',
             'auth_required': 'Authentification étudiant requise',
@@ -561,6 +609,7 @@ class LanguageManager:
             'ethics_placeholder': 'Pregúntame sobre ética basado en el documento Reforming Modernity...',
             'analyzing_materials': 'Analizando tus materiales de tareas...',
             'consulting_ethics': 'Consultando orientación ética...',
+            'preparing_answer': 'Preparando tu respuesta...',
             
             # Audio
             'enable_audio': 'Habilitar Respuestas de Audio',
@@ -590,6 +639,7 @@ class LanguageManager:
             'enter_ethics_question': 'Por favor ingresa una pregunta.',
             'no_modules_found': 'No se encontraron módulos para tu cuenta. Por favor contacta soporte.',
             'student_not_found': 'ID de estudiante \'{student_id}\' no encontrado en la base de datos',
+            'invalid_student_id_format': 'Formato de ID de estudiante no válido (se espera una letra seguida de 8 dígitos, ej: A00034131)',
             'invalid_code': 'Código inválido para el estudiante {student_id}',
             'auth_successful': 'Autenticación exitosa',
             'auth_required': 'Autenticación de estudiante requerida',
@@ -0,0 +1,251 @@
+# response_cache.py - Semantic response cache for AI-generated answers
+
+import atexit
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (module name, language code, document digest)
+CacheScope = Tuple[str, str, str]
+
+# Rows preallocated for a scope's embedding matrix; it doubles as needed up to max_entries
+_INITIAL_ROWS = 256
+
+
+class _ScopeIndex:
+    """Unit embeddings of one scope's cached questions, kept as rows of a float32 matrix"""
+
+    def __init__(self, dim: int, capacity: int):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.keys: List[Optional[tuple]] = []  # row -> entry key, None for a free row
+        self.rows: Dict[tuple, int] = {}
+        self._free: List[int] = []
+
+    def add(self, key: tuple, embedding: np.ndarray, max_rows: int) -> None:
+        """Write an embedding into the key's row, reusing freed rows before growing"""
+        row = self.rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self.keys[row] = key
+            else:
+                row = len(self.keys)
+                if row == len(self.matrix):
+                    grown = np.zeros((max(row + 1, min(2 * row, max_rows)), self.matrix.shape[1]), dtype=np.float32)
+                    grown[:row] = self.matrix
+                    self.matrix = grown
+                self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = embedding
+
+    def remove(self, key: tuple) -> None:
+        """Free the key's row for reuse"""
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.matrix[row] = 0.0
+            self.keys[row] = None
+            self._free.append(row)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def best_match(self, embedding: np.ndarray) -> Tuple[Optional[tuple], float]:
+        """Return the key with the highest cosine similarity and that similarity"""
+        similarities = self.matrix[:len(self.keys)] @ embedding
+        best = int(np.argmax(similarities))
+        return self.keys[best], float(similarities[best])
+
+
+class ResponseCache:
+    """LRU cache of AI responses with optional embedding-based fuzzy matching"""
+
+    def __init__(self, max_entries: int = 10000, similarity_threshold: float = 0.95,
+                 embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None,
+                 path: Optional[str] = None, save_interval: int = 20):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        # Optional pickle file so cached answers survive restarts
+        self.path = Path(path) if path else None
+        self.save_interval = save_interval
+        # (scope..., normalized question) -> (unit embedding or None, response)
+        self._entries: "OrderedDict[tuple, Tuple[Optional[np.ndarray], str]]" = OrderedDict()
+        # Embeddings of each scope's entries, so a fuzzy lookup is one matrix-vector product
+        self._indexes: Dict[CacheScope, _ScopeIndex] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        # Saves run on a background writer thread so store() never pickles on the request path
+        self._save_lock = threading.Lock()
+        self._save_requested = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._load()
+        if self.path is not None:
+            atexit.register(self.save)
+
+    @staticmethod
+    def make_scope(module_name: str, language: str, document_content: str) -> CacheScope:
+        """Build the cache scope for a module, language and document"""
+        digest = hashlib.sha1(document_content[:4096].encode('utf-8', 'ignore')).hexdigest()
+        return (module_name or 'Unknown Module', language, digest)
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        """Normalize a question for exact-match lookups"""
+        return ' '.join(question.lower().split())
+
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        """Compute a unit-length embedding for the question, if enabled"""
+        if not self.embed_fn:
+            return None
+        try:
+            vector = self.embed_fn(question)
+        except Exception as e:
+            logger.warning("Embedding failed, falling back to exact cache matching: %s", e)
+            return None
+        if not vector:
+            return None
+        embedding = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else None
+
+    def lookup(self, scope: CacheScope, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Look up a cached response for a question
+
+        Returns:
+            Tuple of (cached response or None, question embedding to reuse on store)
+        """
+        key = scope + (self._normalize(question),)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[1], entry[0]
+
+        embedding = self._embed(question)
+        if embedding is None:
+            return None, None
+
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                return None, embedding
+
+            best_key, similarity = index.best_match(embedding)
+            if best_key is None or similarity < self.similarity_threshold:
+                return None, embedding
+
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][1], embedding
+
+    def store(self, scope: CacheScope, question: str, response: str,
+              embedding: Optional[np.ndarray] = None) -> None:
+        """Store a response, evicting the least recently used entries beyond capacity"""
+        key = scope + (self._normalize(question),)
+        with self._lock:
+            self._entries[key] = (embedding, response)
+            self._entries.move_to_end(key)
+            self._index(key, embedding)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._unindex(evicted_key)
+            self._unsaved += 1
+            should_save = self.path is not None and self._unsaved >= self.save_interval
+
+        if should_save:
+            self._request_save()
+
+    def _request_save(self) -> None:
+        """Wake the background writer, starting it on first use"""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+                    self._writer.start()
+        self._save_requested.set()
+
+    def _write_loop(self) -> None:
+        """Save whenever a save is requested; stores made while writing are picked up next round"""
+        while True:
+            self._save_requested.wait()
+            self._save_requested.clear()
+            self.save()
+
+    def _index(self, key: tuple, embedding: Optional[np.ndarray]) -> None:
+        """Add or update an entry's row in its scope's matrix; caller holds the lock"""
+        scope = key[:3]
+        if embedding is None:
+            self._unindex(key)
+            return
+        index = self._indexes.get(scope)
+        if index is None or index.matrix.shape[1] != embedding.shape[0]:
+            index = self._indexes[scope] = _ScopeIndex(embedding.shape[0], min(_INITIAL_ROWS, self.max_entries))
+        index.add(key, embedding, self.max_entries)
+
+    def _unindex(self, key: tuple) -> None:
+        """Drop an entry's row from its scope's matrix; caller holds the lock"""
+        scope = key[:3]
+        index = self._indexes.get(scope)
+        if index is not None:
+            index.remove(key)
+            if not index:
+                del self._indexes[scope]
+
+    def save(self) -> None:
+        """Write the cache to its file, if persistence is enabled"""
+        if self.path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._unsaved:
+                    return
+                entries = OrderedDict(self._entries)
+                self._unsaved = 0
+            self._write(entries)
+
+    def _write(self, entries: "OrderedDict[tuple, Tuple[Optional[np.ndarray], str]]") -> None:
+        """Pickle entries to a temporary file and atomically replace the cache file"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(temp_path, 'wb') as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.warning("Failed to save response cache to %s: %s", self.path, e)
+
+    def _load(self) -> None:
+        """Load previously saved entries, if persistence is enabled"""
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                entries = pickle.load(f)
+            if isinstance(entries, OrderedDict):
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+                self._entries = entries
+                for key, (embedding, _) in entries.items():
+                    self._index(key, embedding)
+                logger.info("Loaded %d cached responses from %s", len(entries), self.path)
+        except Exception as e:
+            logger.warning("Failed to load response cache from %s: %s", self.path, e)
+
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+            self._unsaved += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -12,6 +12,9 @@ class SessionManager:
     @staticmethod
     def initialize_session_state() -> None:
         """Initialize all session state variables with proper defaults"""
+        # Runs on every rerun; once a session is set up, skip all the key checks
+        if st.session_state.get('_initialized'):
+            return
         
         # Conversation flow states
         if 'conversation_step' not in st.session_state:
@@ -42,6 +45,10 @@ class SessionManager:
             st.session_state.selected_voice = 'alloy'
         if 'audio_responses' not in st.session_state:
             st.session_state.audio_responses = {}
+        if 'audio_futures' not in st.session_state:
+            st.session_state.audio_futures = {}
+        if 'prefetched_responses' not in st.session_state:
+            st.session_state.prefetched_responses = {}
         
         # Error handling
         if 'error_message' not in st.session_state:
@@ -54,6 +61,8 @@ class SessionManager:
             st.session_state.student_database = None
         if 'database_loaded' not in st.session_state:
             st.session_state.database_loaded = False
+        if 'database_future' not in st.session_state:
+            st.session_state.database_future = None
         
         # Ethics-specific states
         if 'selected_ethics_category' not in st.session_state:
@@ -65,6 +74,7 @@ class SessionManager:
         if 'language' not in st.session_state:
             st.session_state.language = 'en'
         
+        st.session_state._initialized = True
         logger.info("Session state initialized successfully")
     
     @staticmethod
@@ -88,6 +98,8 @@ class SessionManager:
         # Reset chat data
         st.session_state.messages = []
         st.session_state.audio_responses = {}
+        st.session_state.audio_futures = {}
+        st.session_state.prefetched_responses = {}
         
         # Reset error handling
         st.session_state.error_message = None
@@ -100,11 +112,20 @@ class SessionManager:
         
         logger.info("Conversation reset successfully")
     
+    @staticmethod
+    def clear_session() -> None:
+        """Clear all session state so the app starts from scratch, keeping the chosen language"""
+        language = st.session_state.get('language', 'en')
+        st.session_state.clear()
+        st.session_state.language = language
+        logger.info("Session state cleared")
+    
     @staticmethod
     def clear_chat() -> None:
         """Clear only chat messages and audio responses"""
         st.session_state.messages = []
         st.session_state.audio_responses = {}
+        st.session_state.audio_futures = {}
         logger.info("Chat cleared successfully")
     
     @staticmethod
@@ -47,6 +47,12 @@ class UIComponents:
     @staticmethod
     def get_enhanced_css() -> str:
         """Get enhanced CSS with official Roehampton University brand colors and RTL support"""
+        return UIComponents._build_css(language_manager.is_rtl())
+    
+    @staticmethod
+    @st.cache_resource(show_spinner=False)
+    def _build_css(rtl: bool) -> str:
+        """Build the page CSS once per process for each text direction"""
         base_css = """
         <style>
             /* Import Google Fonts */
@@ -242,6 +248,25 @@ class UIComponents:
                 margin-bottom: 1rem;
             }
             
+            /* Chat message bubbles */
+            .chat-bubble {
+                color: #000;
+                padding: 1rem;
+                border-radius: 10px;
+                margin: 1rem 0;
+                border-left: 4px solid;
+            }
+            
+            .chat-bubble-user {
+                background: #e3f2fd;
+                border-left-color: #2196f3;
+            }
+            
+            .chat-bubble-assistant {
+                background: #f1f8e9;
+                border-left-color: #4caf50;
+            }
+            
             /* Responsive design */
             @media (max-width: 768px) {
                 .roehampton-header h1 {
@@ -261,7 +286,7 @@ class UIComponents:
         """
         
         # Add RTL-specific CSS if needed
-        rtl_css = get_rtl_css()
+        rtl_css = get_rtl_css() if rtl else ""
         return base_css + rtl_css
     
     def render_voice_selector(self):
@@ -276,6 +301,9 @@ class UIComponents:
             help=t('audio_help')
         )
         st.session_state.audio_enabled = audio_enabled
+        if audio_enabled != current_audio_state:
+            # Audio players in the chat depend on this, so rerun the whole app
+            st.rerun()
         
         if audio_enabled:
             # Voice selection
@@ -297,6 +325,9 @@ class UIComponents:
             )
             
             st.session_state.selected_voice = selected_voice
+            if selected_voice != current_voice:
+                # Chat audio is keyed by voice, so rerun the whole app to re-voice the players
+                st.rerun()
             
             # Test voice button
             if st.button(f"🎵 {t('test_voice')}", type="secondary"):
@@ -305,8 +336,7 @@ class UIComponents:
                         audio_bytes = self.audio_manager.test_voice(selected_voice)
                         
                     if audio_bytes:
-                        audio_html = self.audio_manager.create_audio_player(audio_bytes, key="voice_test")
-                        st.markdown(audio_html, unsafe_allow_html=True)
+                        self.audio_manager.render_audio_player(audio_bytes)
                         st.success(t('audio_ready'))
                     else:
                         st.error(t('audio_error'))
@@ -420,67 +450,75 @@ class UIComponents:
     def render_sidebar(self, database_stats: dict):
         """Render sidebar with student info and controls with translation support"""
         with st.sidebar:
-            # Language selector
-            st.markdown(f"### 🌍 {t('language_selector')}")
-            render_language_selector()
+            self._render_sidebar_content(database_stats)
             
-            # Voice settings
-            self.render_voice_selector()
+    @st.fragment
+    def _render_sidebar_content(self, database_stats: dict):
+        """Render the sidebar body; reruns on its own when only sidebar widgets change"""
+        session = st.session_state  # looked up once; read many times per render
+        
+        # Language selector
+        st.markdown(f"### 🌍 {t('language_selector')}")
+        render_language_selector()
+        
+        # Voice settings
+        self.render_voice_selector()
+        
+        st.markdown("---")
+        
+        # Student information (if authenticated)
+        if session.student_id and session.student_data:
+            st.markdown(f"### 👤 {t('student_information')}")
+            st.markdown(f"""
+            <div style="background: #f0f2f6; color: #000; padding: 1rem; border-radius: 8px;">
+                <p><strong>ID:</strong> {session.student_id}</p>
+                <p><strong>{t('programme_label')}</strong> {session.student_data['programme']}</p>
+                <p><strong>{t('module_label')}</strong> {len(session.available_modules)}</p>
+            </div>
+            """, unsafe_allow_html=True)
+            st.markdown("---")
+        
+        # Current session info
+        if session.conversation_step != 'welcome':
+            st.markdown(f"### 📁 {t('current_session')}")
+            st.markdown(f"**Path:** {session.selected_path or 'Not selected'}")
+            
+            if session.selected_path == 'ethics':
+                st.markdown(f"**{t('ethics_document')}:** Reforming Modernity")
+            elif session.selected_module:
+                st.markdown(f"**{t('module_label')}** {session.selected_module['module']}")
+                if session.selected_coursework:
+                    st.markdown(f"**Type:** {session.selected_coursework['title']}")
             
             st.markdown("---")
             
-            # Student information (if authenticated)
-            if st.session_state.student_id and st.session_state.student_data:
-                st.markdown(f"### 👤 {t('student_information')}")
-                st.markdown(f"""
-                <div style="background: #f0f2f6; color: #000; padding: 1rem; border-radius: 8px;">
-                    <p><strong>ID:</strong> {st.session_state.student_id}</p>
-                    <p><strong>{t('programme_label')}</strong> {st.session_state.student_data['programme']}</p>
-                    <p><strong>{t('module_label')}</strong> {len(st.session_state.available_modules)}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                st.markdown("---")
+        # Database status
+        st.markdown(f"### 📊 {t('system_status')}")
+        if session.database_loaded:
+            st.success(f"✅ {t('database_connected')}")
+            st.markdown(f"**Students:** {database_stats['students']}")
+            st.markdown(f"**Programmes:** {database_stats['programmes']}")
+        else:
+            st.error(f"❌ {t('database_not_loaded')}")
             
-            # Current session info
-            if st.session_state.conversation_step != 'welcome':
-                st.markdown(f"### 📁 {t('current_session')}")
-                st.markdown(f"**Path:** {st.session_state.selected_path or 'Not selected'}")
+        if Config.OPENAI_API_KEY:
+            st.success(f"✅ {t('ai_service_connected')}")
+        else:
+            st.error(f"❌ {t('ai_service_unavailable')}")
                 
-                if st.session_state.selected_path == 'ethics':
-                    st.markdown(f"**{t('ethics_document')}:** Reforming Modernity")
-                elif st.session_state.selected_module:
-                    st.markdown(f"**{t('module_label')}** {st.session_state.selected_module['module']}")
-                    if st.session_state.selected_coursework:
-                        st.markdown(f"**Type:** {st.session_state.selected_coursework['title']}")
+        st.markdown("---")
                 
-                st.markdown("---")
-            
-            # Database status
-            st.markdown(f"### 📊 {t('system_status')}")
-            if st.session_state.database_loaded:
-                st.success(f"✅ {t('database_connected')}")
-                st.markdown(f"**Students:** {database_stats['students']}")
-                st.markdown(f"**Programmes:** {database_stats['programmes']}")
-            else:
-                st.error(f"❌ {t('database_not_loaded')}")
-            
-            if Config.OPENAI_API_KEY:
-                st.success(f"✅ {t('ai_service_connected')}")
-            else:
-                st.error(f"❌ {t('ai_service_unavailable')}")
+        # Quick actions
+        st.markdown(f"### ⚡ {t('quick_actions')}")
             
-            st.markdown("---")
-            
-            # Quick actions
-            st.markdown(f"### ⚡ {t('quick_actions')}")
+        if st.button(f"🏠 {t('start_over')}", use_container_width=True, type="secondary"):
+            from session_manager import SessionManager
+            SessionManager.reset_conversation()
+            st.rerun()
             
-            if st.button(f"🏠 {t('start_over')}", use_container_width=True, type="secondary"):
+        if session.conversation_step == 'chat':
+            if st.button(f"🗑️ {t('clear_chat')}", use_container_width=True, type="secondary"):
                 from session_manager import SessionManager
-                SessionManager.reset_conversation()
+                SessionManager.clear_chat()
                 st.rerun()
-            
-            if st.session_state.conversation_step == 'chat':
-                if st.button(f"🗑️ {t('clear_chat')}", use_container_width=True, type="secondary"):
-                    from session_manager import SessionManager
-                    SessionManager.clear_chat()
-                    st.rerun()
+            
\ No newline at end of file